@@ -0,0 +1,34 @@
+"""add keyset pagination indexes
+
+Revision ID: 4f1c2d9e7a30
+Revises: bb77ca1a56c4
+Create Date: 2026-10-18 09:12:05.118240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1c2d9e7a30'
+down_revision: Union[str, Sequence[str], None] = 'bb77ca1a56c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_role_created_at_id', 'users', ['role', 'created_at', 'id'], unique=False)
+    op.create_index('ix_users_level_id_role_created_at_id', 'users', ['level_id', 'role', 'created_at', 'id'], unique=False)
+    op.create_index('ix_courses_department_id_created_at_id', 'courses', ['department_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_user_course_course_id_user_id', 'user_course', ['course_id', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_course_course_id_user_id', table_name='user_course')
+    op.drop_index('ix_courses_department_id_created_at_id', table_name='courses')
+    op.drop_index('ix_users_level_id_role_created_at_id', table_name='users')
+    op.drop_index('ix_users_role_created_at_id', table_name='users')
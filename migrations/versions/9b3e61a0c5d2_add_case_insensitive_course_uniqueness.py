@@ -0,0 +1,36 @@
+"""add case insensitive course uniqueness
+
+Revision ID: 9b3e61a0c5d2
+Revises: 4f1c2d9e7a30
+Create Date: 2026-10-18 11:40:27.530912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3e61a0c5d2'
+down_revision: Union[str, Sequence[str], None] = '4f1c2d9e7a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # fails if the table already holds case-insensitive duplicates, clean those up first
+    op.create_index('uq_courses_lower_code', 'courses', [sa.text('lower(code)')], unique=True)
+    op.create_index(
+        'uq_courses_lower_name_department_id_level_id',
+        'courses',
+        [sa.text('lower(name)'), 'department_id', 'level_id'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_courses_lower_name_department_id_level_id', table_name='courses')
+    op.drop_index('uq_courses_lower_code', table_name='courses')
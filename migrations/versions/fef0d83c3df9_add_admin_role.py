@@ -0,0 +1,30 @@
+"""add admin role
+
+Revision ID: fef0d83c3df9
+Revises: 9b3e61a0c5d2
+Create Date: 2026-10-18 16:05:41.207318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fef0d83c3df9'
+down_revision: Union[str, Sequence[str], None] = '9b3e61a0c5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # role_enum stores the member names
+    op.execute("ALTER TYPE role_enum ADD VALUE IF NOT EXISTS 'ADMIN'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # PostgreSQL cannot drop a value from an enum type, demote admins instead
+    op.execute("UPDATE users SET role = 'LECTURER' WHERE role = 'ADMIN'")
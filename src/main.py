@@ -1,13 +1,22 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from src.util.db import init_db, drop_db
-from src.util.redis_client import setup_redis
+from src.util.db import engine, init_db, drop_db
+from src.util.redis_client import close_redis, setup_redis, start_invalidation_listener, stop_invalidation_listener
 from fastapi.middleware.cors import CORSMiddleware
 from src.util.config import Settings 
 from src.util.exception import register_error_handlers
+from src.util.metrics import MetricsMiddleware, start_metrics, stop_metrics
+from src.util.query_budget import QueryCountMiddleware
+from src.util.slow_query import install_slow_query_log
+from src.util.tracing import TracingMiddleware
 from src.v1.controllers.user import user_router
 from src.v1.controllers.courses import courses_router
+from src.v1.controllers.health import health_router
+from src.v1.controllers.metrics import metrics_router
 from src.v1.auth.routes import auth_router
+from src.v1.auth.revocation import revocation_store
+from src.v1.auth.service import shutdown_hash_pool, start_hash_pool
+from src.v1.service.registry import reference_registry
 @asynccontextmanager
 async def life_span(app: FastAPI):
     """
@@ -30,16 +39,36 @@ async def life_span(app: FastAPI):
     
     # Startup: Initialize the database
     print("server is starting....")
+    # no-op unless slow_query_threshold_ms is set
+    install_slow_query_log()
     await init_db()
     print("server has started!!")
     
     print("redis is starting....")
     await setup_redis()
+    # keeps this worker's in-process cache coherent with the other workers
+    await start_invalidation_listener()
+    # per-worker view of revoked tokens, fed by the revocation stream
+    await revocation_store.start()
     print("redis has started!!")
+
+    # levels/departments held in memory, reloaded when any worker publishes a change
+    await reference_registry.start()
+    # event loop lag probe, and the snapshot writer when metrics_dir is set
+    await start_metrics()
+    # worker processes for bulk password hashing
+    start_hash_pool()
     yield  # Yield control back to FastAPI
     
     # Shutdown: Perform any necessary cleanup
     print("server is ending.....")
+    await stop_metrics()
+    await reference_registry.stop()
+    await stop_invalidation_listener()
+    await revocation_store.stop()
+    shutdown_hash_pool()
+    await close_redis()
+    await engine.dispose()
 
 app = FastAPI(
     lifespan=life_span,
@@ -54,7 +83,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
+app.add_middleware(MetricsMiddleware)
+# statement counting per request, a no-op unless QUERY_BUDGET_MODE is set
+app.add_middleware(QueryCountMiddleware)
+# added last so it wraps everything else, including CORS and error handling
+app.add_middleware(TracingMiddleware)
 
 #register error handlers 
 register_error_handlers(app)
@@ -63,6 +98,9 @@ register_error_handlers(app)
 app.include_router(auth_router, prefix=Settings.API_PREFIX)
 app.include_router(user_router, prefix=Settings.API_PREFIX)
 app.include_router(courses_router, prefix=Settings.API_PREFIX)
+app.include_router(health_router, prefix=Settings.API_PREFIX)
+# scraped by Prometheus at the conventional path, outside the API prefix
+app.include_router(metrics_router)
 # app.include_router(admin_router, prefix=Settings.API_PREFIX)
 
 
@@ -1,8 +1,16 @@
 import asyncio
-from src.util.db import engine, Base, async_session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from src.util.config import config
+from src.util.db import build_engine, Base
+from src.util.redis_client import setup_redis
+from src.v1.service.registry import reference_registry
 from src.v1.model.user import Level, Level_Enum
 from src.v1.model.courses import Department
 
+# one-off script, no point keeping a pool of warm connections around
+engine = build_engine(config.DATABASE_URL, name="seed", pool_mode="null")
+async_session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
 async def seed_data():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -31,5 +39,10 @@ async def seed_data():
 
         print("Levels and Departments seeded successfully!")
 
+    # running api workers reload their in-memory levels/departments
+    await setup_redis()
+    await reference_registry.publish_change()
+    await engine.dispose()
+
 if __name__ == "__main__":
     asyncio.run(seed_data())
@@ -0,0 +1,78 @@
+import csv
+import io
+from typing import List, Tuple, Type, TypeVar
+
+from fastapi import Request
+from pydantic import BaseModel, ValidationError
+
+from src.v1.base.exception import BadRequest
+from src.v1.base.schema import BulkImportReport, BulkRowResult
+
+# upper bound on rows accepted by a single import request
+BULK_IMPORT_MAX_ROWS = 10_000
+
+RowSchema = TypeVar("RowSchema", bound=BaseModel)
+
+
+def _parse_csv(raw: bytes) -> List[dict]:
+    text = raw.decode("utf-8-sig")
+    # empty cells mean "not provided", not an empty string
+    return [
+        {key: (value if value != "" else None) for key, value in row.items()}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+
+async def read_import_rows(request: Request) -> List[dict]:
+    """
+    Read the rows of a bulk import from the request body.
+
+    Accepts a JSON array of objects, a raw text/csv body, or a multipart
+    upload with the CSV in a `file` field.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("text/csv"):
+        rows = _parse_csv(await request.body())
+    elif content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise BadRequest("Expected a CSV upload in the 'file' field")
+        rows = _parse_csv(await upload.read())
+    else:
+        try:
+            rows = await request.json()
+        except ValueError:
+            raise BadRequest("Body must be a JSON array or CSV")
+        if not isinstance(rows, list):
+            raise BadRequest("Body must be a JSON array of rows")
+
+    if not rows:
+        raise BadRequest("No rows to import")
+    if len(rows) > BULK_IMPORT_MAX_ROWS:
+        raise BadRequest(f"At most {BULK_IMPORT_MAX_ROWS} rows can be imported at once")
+    return rows
+
+
+def validate_import_rows(
+    rows: List[dict], schema: Type[RowSchema]
+) -> Tuple[List[Tuple[int, RowSchema]], List[BulkRowResult]]:
+    """Validate each row against `schema`, keeping the bad ones as per-row errors."""
+    valid = []
+    errors = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, schema.model_validate(row)))
+        except ValidationError as e:
+            message = "; ".join(
+                f"{'.'.join(str(loc) for loc in error['loc']) or 'row'}: {error['msg']}"
+                for error in e.errors()
+            )
+            errors.append(BulkRowResult(row=index, status="error", error=message))
+    return valid, errors
+
+
+def build_import_report(results: List[BulkRowResult]) -> BulkImportReport:
+    results = sorted(results, key=lambda result: result.row)
+    created = sum(1 for result in results if result.status == "created")
+    return BulkImportReport(created=created, failed=len(results) - created, rows=results)
@@ -0,0 +1,171 @@
+"""
+Binary encoding of cached values.
+
+Every value is written as a 4 byte header followed by the payload:
+
+    magic (0xC7) | header version | format id | compression id | payload
+
+so the format or compression of a namespace can be changed at any time and
+old entries still decode. Values without the magic byte are legacy JSON text.
+
+orjson ships with fastapi[all]; msgpack, zstandard and lz4 are used when
+installed, a codec naming a missing library falls back to json/zlib.
+"""
+import json
+import zlib
+from typing import Any, Callable, Dict, Tuple
+
+from src.util.config import config
+from src.util.log import setup_logger
+
+logger = setup_logger(__name__, "redis.log")
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+MAGIC = 0xC7
+HEADER_VERSION = 1
+HEADER_SIZE = 4
+
+FORMAT_JSON = 1
+FORMAT_ORJSON = 2
+FORMAT_MSGPACK = 3
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSION_LZ4 = 3
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=str)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=str, use_bin_type=True)
+
+
+def _msgpack_loads(payload: bytes) -> Any:
+    return msgpack.unpackb(payload, raw=False)
+
+
+_FORMATS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    FORMAT_JSON: (_json_dumps, json.loads),
+}
+if orjson is not None:
+    _FORMATS[FORMAT_ORJSON] = (_orjson_dumps, orjson.loads)
+if msgpack is not None:
+    _FORMATS[FORMAT_MSGPACK] = (_msgpack_dumps, _msgpack_loads)
+
+_COMPRESSIONS: Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    COMPRESSION_NONE: (lambda data: data, lambda data: data),
+    COMPRESSION_ZLIB: (lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+if zstandard is not None:
+    _COMPRESSIONS[COMPRESSION_ZSTD] = (
+        lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+if lz4_frame is not None:
+    _COMPRESSIONS[COMPRESSION_LZ4] = (lz4_frame.compress, lz4_frame.decompress)
+
+_FORMAT_NAMES = {"json": FORMAT_JSON, "orjson": FORMAT_ORJSON, "msgpack": FORMAT_MSGPACK}
+_COMPRESSION_NAMES = {
+    "none": COMPRESSION_NONE,
+    "zlib": COMPRESSION_ZLIB,
+    "zstd": COMPRESSION_ZSTD,
+    "lz4": COMPRESSION_LZ4,
+}
+
+
+class CacheCodec:
+    """Serialises values with one format and compresses payloads above `threshold` bytes."""
+
+    def __init__(self, fmt: int, compression: int, threshold: int):
+        self.fmt = fmt
+        self.compression = compression
+        self.threshold = threshold
+        self._dumps = _FORMATS[fmt][0]
+        self._compress = _COMPRESSIONS[compression][0]
+
+    @classmethod
+    def from_spec(cls, spec: str, threshold: int) -> "CacheCodec":
+        """
+        Build a codec from "format" or "format+compression", e.g. "msgpack+zstd".
+        Unavailable libraries fall back to json / zlib.
+        """
+        fmt_name, _, compression_name = spec.partition("+")
+        fmt = _FORMAT_NAMES.get(fmt_name)
+        if fmt not in _FORMATS:
+            logger.warning(f"Cache format {fmt_name!r} unavailable, using json")
+            fmt = FORMAT_JSON
+        compression = _COMPRESSION_NAMES.get(compression_name or "none")
+        if compression not in _COMPRESSIONS:
+            logger.warning(f"Cache compression {compression_name!r} unavailable, using zlib")
+            compression = COMPRESSION_ZLIB
+        return cls(fmt, compression, threshold)
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._dumps(value)
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(payload) > self.threshold:
+            payload = self._compress(payload)
+            compression = self.compression
+        return bytes((MAGIC, HEADER_VERSION, self.fmt, compression)) + payload
+
+
+def decode(raw: bytes) -> Any:
+    """
+    Decode a value written by any CacheCodec (or a legacy plain JSON value).
+    Raises ValueError for anything it cannot decode.
+    """
+    if not raw or raw[0] != MAGIC:
+        return json.loads(raw)
+    version, fmt, compression = raw[1], raw[2], raw[3]
+    if version != HEADER_VERSION:
+        raise ValueError(f"unsupported cache header version {version}")
+    if fmt not in _FORMATS or compression not in _COMPRESSIONS:
+        raise ValueError(f"cache entry needs unavailable format {fmt} / compression {compression}")
+    try:
+        payload = _COMPRESSIONS[compression][1](raw[HEADER_SIZE:])
+        return _FORMATS[fmt][1](payload)
+    except ValueError:
+        raise
+    except Exception as e:
+        # zlib.error, msgpack/zstd errors... callers only handle ValueError
+        raise ValueError(f"corrupt cache entry: {e}") from e
+
+
+# namespace -> codec
+_codecs: Dict[str, CacheCodec] = {}
+
+
+def codec_for(namespace: str) -> CacheCodec:
+    """Codec for a key namespace, from config.cache_codecs or config.cache_default_codec."""
+    codec = _codecs.get(namespace)
+    if codec is None:
+        spec = config.cache_codecs.get(namespace, config.cache_default_codec)
+        codec = CacheCodec.from_spec(spec, config.cache_compress_threshold)
+        _codecs[namespace] = codec
+    return codec
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Config(BaseSettings):
@@ -9,6 +10,118 @@ class Config(BaseSettings):
     access_token_expiry:int
     refresh_token_expiry:int
 
+    # logging: default level, per-module overrides as JSON, e.g.
+    # LOG_LEVELS='{"src.v1.auth": "INFO", "src.util.redis_client": "WARNING"}'
+    log_level: str = "DEBUG"
+    log_levels: Dict[str, str] = {}
+    # console output: "rich" (coloured, for development), "plain" or "none"
+    log_console: str = "rich"
+    # keep 1 in N DEBUG records per call site
+    log_debug_sample_every: int = 1
+
+    # per-request tracing: OTLP/JSON spans, SQL statements included, written
+    # to logs/<trace_export_file>
+    tracing_enabled: bool = False
+    # also send the traced db/cache/hash timings to clients in a Server-Timing
+    # header; internal timings, only for development or trusted deployments
+    server_timing_enabled: bool = False
+    trace_export_file: str = "traces.jsonl"
+    trace_service_name: str = "exam-mgt-system"
+
+    # statement counting per request: "off", "warn" (log budget overruns and
+    # N+1 patterns) or "raise" (fail requests over their @query_budget)
+    query_budget_mode: str = "off"
+    # same statement this many times with different parameters is reported
+    n_plus_one_threshold: int = 5
+
+    # /metrics: with several workers set metrics_dir to a directory they all
+    # share (emptied on deploy), each writes its snapshot there
+    metrics_dir: Optional[str] = None
+    metrics_flush_interval: float = 5.0
+    event_loop_lag_interval: float = 0.5
+
+    # slow-query log (logs/slow_query.log), off unless a threshold is set
+    slow_query_threshold_ms: Optional[float] = None
+    # capture EXPLAIN (ANALYZE, BUFFERS) of slow SELECTs on the read engine
+    slow_query_explain: bool = True
+    # at most one plan per statement per interval, and this many per minute
+    slow_query_explain_interval: float = 600.0
+    slow_query_explain_per_minute: int = 6
+    slow_query_explain_timeout_ms: int = 10000
+
+    # database connection pool, "queue" keeps warm connections per worker,
+    # "null" opens a fresh connection per session (one-off scripts, migrations)
+    db_pool_mode: str = "queue"
+    db_pool_size: int = 10
+    db_max_overflow: int = 5
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # total connections postgres should see from the api, split across workers
+    db_max_connections: Optional[int] = None
+    # read replica, reads fall back to DATABASE_URL when unset
+    database_read_url: Optional[str] = None
+    # seconds a user's reads stay on the primary after they write
+    read_your_writes_window: int = 5
+    # number of uvicorn workers (same env var uvicorn reads for --workers)
+    web_concurrency: int = 1
+
+    # redis connection pool per worker, callers wait up to redis_pool_timeout
+    # seconds for a free connection once redis_max_connections are in use
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0
+    redis_socket_timeout: float = 5.0
+    redis_socket_connect_timeout: float = 2.0
+    redis_health_check_interval: int = 30
+    # stream tails (XREAD BLOCK) wake up at least this often, a read taking
+    # redis_socket_timeout longer than that means the connection is gone
+    redis_stream_block_ms: int = 5000
+
+    # per-worker L1 cache in front of redis, entries live at most cache_local_ttl seconds
+    cache_local_ttl: float = 5.0
+    cache_local_max_entries: int = 1024
+    # per-namespace (key prefix before the first ":") overrides, 0 disables L1 for it
+    cache_local_namespaces: Dict[str, int] = {}
+
+    # revoked tokens, each worker answers "not revoked" from a bloom filter
+    revocation_bloom_capacity: int = 100_000
+    revocation_bloom_error_rate: float = 0.001
+    revocation_local_max_entries: int = 10_000
+    # longest wait between rebuilds while live revocations fill the bloom filter
+    revocation_rebuild_max_delay: float = 300.0
+
+    # verified access-token claims kept per worker, keyed by token hash
+    claims_cache_max_entries: int = 10_000
+
+    # login attempts allowed per sliding window, per email/school_id and per client IP
+    login_window_seconds: int = 300
+    login_max_attempts_per_identifier: int = 5
+    login_max_attempts_per_ip: int = 50
+
+    # seconds the authenticated user resolved from a token stays cached
+    principal_cache_ttl: int = 60
+
+    # cache value encoding, "format[+compression]" with format json|orjson|msgpack
+    # and compression none|zlib|zstd|lz4, overridable per namespace
+    cache_default_codec: str = "orjson+zlib"
+    cache_codecs: Dict[str, str] = {}
+    # payloads larger than this many bytes are compressed
+    cache_compress_threshold: int = 1024
+
+    # new password hashes use this scheme ("bcrypt" or "argon2", argon2 needs
+    # argon2-cffi), hashes in the other scheme or with weaker parameters are
+    # replaced on the user's next login
+    password_hash_scheme: str = "bcrypt"
+    password_bcrypt_rounds: int = 12
+    password_argon2_time_cost: int = 3
+    password_argon2_memory_cost: int = 65536  # KiB
+    password_argon2_parallelism: int = 2
+    # hashes/verifications running at once per worker, further logins queue
+    password_hash_concurrency: int = 4
+    # worker processes per app worker used to hash passwords for bulk imports,
+    # defaults to cpu count / web_concurrency
+    password_hash_processes: Optional[int] = None
+
 
     model_config = SettingsConfigDict(
         case_sensitive=False,
@@ -22,4 +135,4 @@ class Settings:
     PROJECT_NAME: str = "Exam Management System"
     PROJECT_VERSION: str = "1.0.0"
     PROJECT_DESCRIPTION: str = "Backend for Exam management System"
-    API_PREFIX: str = "/api/v1"
\ No newline at end of file
+    API_PREFIX: str = "/api/v1"
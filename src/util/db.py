@@ -1,28 +1,254 @@
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import time
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from .config import config
 from src.v1.base.model import Base
 from src.v1.model import *
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.pool import NullPool
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from contextlib import asynccontextmanager
 
 from src.util.log import setup_logger
+from src.util.redis_client import key_exist, set_cache
+from src.util.tracing import record_query
 logger = setup_logger(__name__, file_path="db.log")
 
+# Called after every statement on every engine with
+# (statement, parameters, started_ns, ended_ns). Observers run inline with the
+# query, keep them cheap and never let them raise.
+QueryObserver = Callable[[str, Any, int, int], None]
+_query_observers: List[QueryObserver] = [record_query]
+
+
+def add_query_observer(observer: QueryObserver):
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+
+
+def remove_query_observer(observer: QueryObserver):
+    if observer in _query_observers:
+        _query_observers.remove(observer)
+
+
+class PoolStats:
+    """Counters collected from an engine's pool, used to tune pool sizing."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.overflow_peak = 0
+        self.connect_total = 0.0
+        self.connect_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.waits += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def record_connect(self, seconds: float):
+        self.connect_total += seconds
+        self.connect_max = max(self.connect_max, seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "waits": self.waits,
+            "wait_total_ms": round(self.wait_total * 1000, 3),
+            "wait_avg_ms": round(self.wait_total / self.waits * 1000, 3) if self.waits else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "overflow_peak": self.overflow_peak,
+            "connect_avg_ms": round(self.connect_total / self.connects * 1000, 3) if self.connects else 0.0,
+            "connect_max_ms": round(self.connect_max * 1000, 3),
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records how long checkouts waited on an
+    exhausted pool and, separately, how long opening new connections took.
+    """
+
+    stats: Optional[PoolStats] = None
+
+    def _do_get(self):
+        # only a checkout that finds every connection (overflow included) in
+        # use has to wait, the others get an idle or a freshly opened one
+        saturated = self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            if self.stats is not None:
+                self.stats.timeouts += 1
+            raise
+        if self.stats is not None:
+            if saturated:
+                self.stats.record_wait(time.perf_counter() - started)
+            self.stats.overflow_peak = max(self.stats.overflow_peak, self.overflow())
+        return conn
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        record = super()._create_connection()
+        if self.stats is not None:
+            self.stats.record_connect(time.perf_counter() - started)
+        return record
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool, keep counting into the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+# name -> (engine, stats) for every engine built in this process
+_engines: Dict[str, tuple[AsyncEngine, PoolStats]] = {}
+
+
+def _pool_sizing() -> tuple[int, int]:
+    """
+    Work out pool_size/max_overflow for this worker.
+
+    When db_max_connections is set it is treated as the budget for the whole
+    deployment and divided across web_concurrency workers, a quarter of each
+    worker's share being kept as overflow for bursts.
+    """
+    if not config.db_max_connections:
+        return config.db_pool_size, config.db_max_overflow
+    per_worker = max(1, config.db_max_connections // max(1, config.web_concurrency))
+    overflow = per_worker // 4
+    return max(1, per_worker - overflow), overflow
+
+
+def _instrument_engine(engine: AsyncEngine, stats: PoolStats):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.checkins += 1
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidations += 1
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started_ns = time.time_ns()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        ended = time.time_ns()
+        started = getattr(context, "_query_started_ns", ended)
+        for observer in _query_observers:
+            try:
+                observer(statement, parameters, started, ended)
+            except Exception as e:
+                logger.error(f"Query observer {observer} failed: {e}")
+
+
+def build_engine(url: str, name: str = "primary", pool_mode: Optional[str] = None) -> AsyncEngine:
+    """
+    Create an async engine for `url`.
+
+    Args:
+        url (str): Database URL.
+        name (str): Label the pool statistics are reported under.
+        pool_mode (str, optional): "queue" or "null", defaults to config.db_pool_mode.
+            Background scripts such as seed.py should pass "null".
+
+    Returns:
+        AsyncEngine: The configured engine.
+    """
+    mode = pool_mode or config.db_pool_mode
+    stats = PoolStats(name)
+
+    if mode == "null":
+        new_engine = create_async_engine(url=url, poolclass=NullPool, future=True)
+    elif mode == "queue":
+        pool_size, max_overflow = _pool_sizing()
+        new_engine = create_async_engine(
+            url=url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=config.db_pool_timeout,
+            pool_recycle=config.db_pool_recycle,
+            pool_pre_ping=config.db_pool_pre_ping,
+            future=True,
+        )
+        new_engine.pool.stats = stats
+        logger.info(f"{name} engine using a queue pool (size={pool_size}, overflow={max_overflow})")
+    else:
+        raise ValueError(f"unknown db_pool_mode {mode!r}, expected 'queue' or 'null'")
+
+    _instrument_engine(new_engine, stats)
+    _engines[name] = (new_engine, stats)
+    return new_engine
+
+
+def pool_stats() -> Dict[str, dict]:
+    """
+    Snapshot of every engine's pool: live sizes from the pool itself plus
+    the counters collected since startup.
+    """
+    snapshot = {}
+    for name, (target, stats) in _engines.items():
+        data = stats.to_dict()
+        pool = target.pool
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            data.update(
+                mode="queue",
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                # QueuePool counts overflow from -size up, negative until the pool is full
+                overflow=max(0, pool.overflow()),
+            )
+        else:
+            data["mode"] = "null"
+        snapshot[name] = data
+    return snapshot
+
+
 # Create async engine
-engine = create_async_engine(
-    url=config.DATABASE_URL,
-    # echo=settings.debug,
-    poolclass=NullPool,  # Use NullPool for async operations
-    future=True,
-)
+engine = build_engine(config.DATABASE_URL)
 
 
 async_session = async_sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Reads go to the replica when one is configured, otherwise they share the primary pool
+read_engine = (
+    build_engine(config.database_read_url, name="replica")
+    if config.database_read_url
+    else engine
+)
+
+async_read_session = async_sessionmaker(
+    bind=read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
 
 
 # @asynccontextmanager
@@ -52,25 +278,124 @@ async_session = async_sessionmaker(
 # )
 
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
+@asynccontextmanager
+async def session_scope() -> AsyncGenerator[AsyncSession, None]:
     """
-    Dependency function to get database session.
+    Unit of work on the primary: the whole block runs in exactly one
+    transaction, committed when it exits cleanly and rolled back otherwise.
+    Services inside the block only flush, they never commit or roll back.
 
     Yields:
         AsyncSession: Database session
     """
     async with async_session() as session:
         try:
-            yield session
-            await session.commit()
+            async with session.begin():
+                yield session
         except SQLAlchemyError as e:
             logger.error(f"Database error: {e}")
-            await session.rollback()
+            raise
+        # only reached once the transaction has committed
+        for callback in session.info.pop("after_commit", []):
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"after_commit callback {callback} failed: {e}")
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]):
+    """
+    Run `callback` once the session's unit of work has committed, so caches
+    are only invalidated when the change is visible to other readers.
+    Dropped if the transaction rolls back.
+    """
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+@asynccontextmanager
+async def savepoint(session: AsyncSession) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Nested unit of work inside the current transaction. A failure inside the
+    block only rolls back to the savepoint, the outer transaction carries on.
+
+    Yields:
+        AsyncSession: The same session
+    """
+    async with session.begin_nested():
+        yield session
+
+
+@asynccontextmanager
+async def read_session_scope() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session on the read replica (or the primary if none is configured).
+    Nothing is ever committed, closing the session rolls the transaction back.
+
+    Yields:
+        AsyncSession: Database session
+    """
+    async with async_read_session() as session:
+        try:
+            yield session
+        except SQLAlchemyError as e:
+            logger.error(f"Database error on read session: {e}")
             raise
         finally:
             await session.close()
 
 
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency function to get database session. Declare it with
+    Depends(get_session, scope="function") so the commit happens before the
+    response is sent.
+
+    Yields:
+        AsyncSession: Database session
+    """
+    async with session_scope() as session:
+        yield session
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency function to get a read-only database session bound to the replica.
+
+    Yields:
+        AsyncSession: Database session
+    """
+    async with read_session_scope() as session:
+        yield session
+
+
+RECENT_WRITE_PREFIX = "db:recent-write:"
+
+
+def replica_configured() -> bool:
+    return read_engine is not engine
+
+
+async def mark_recent_write(owner: str):
+    """
+    Remember that `owner` just wrote to the primary so their reads stay on the
+    primary for config.read_your_writes_window seconds (replica lag).
+    """
+    await set_cache(
+        key=f"{RECENT_WRITE_PREFIX}{owner}",
+        data=1,
+        ttl=config.read_your_writes_window,
+    )
+
+
+async def has_recent_write(owner: str) -> bool:
+    try:
+        return await key_exist(f"{RECENT_WRITE_PREFIX}{owner}")
+    except Exception as e:
+        # when in doubt read from the primary, it is never stale
+        logger.error(f"Failed to check recent writes for {owner}: {e}")
+        return True
+
+
 
 async def init_db():
     """
@@ -23,7 +23,8 @@ from src.v1.base.exception import (
     ServerError,
     NotActive, 
     BaseExceptionClass,
-    AuthorizationError
+    AuthorizationError,
+    TooManyRequests
     
     
 )
@@ -261,6 +262,22 @@ def register_error_handlers(app: FastAPI):
         )
     )
 
+    @app.exception_handler(TooManyRequests)
+    async def too_many_requests_handler(request: Request, exc: TooManyRequests):
+        exception_logger.warning(f"Too many requests: {exc.message}")
+        validated_data = ErrorResponse(
+            message=exc.message or "Too many requests",
+            error_code="too_many_requests",
+            resolution=f"Retry after {exc.retry_after} seconds" if exc.retry_after else None,
+            data=None,
+        )
+        headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+        return JSONResponse(
+            content=validated_data.model_dump(),
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers=headers,
+        )
+
     # Built-in exception handlers
     app.add_exception_handler(
         HTTPException,
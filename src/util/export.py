@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Sequence
+
+from fastapi.responses import StreamingResponse
+
+# rows encoded per chunk written to the socket
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def _encode_rows(
+    rows: AsyncIterator[dict], fmt: str, fieldnames: Sequence[str]
+) -> AsyncIterator[bytes]:
+    """Encode rows as NDJSON or CSV, EXPORT_BATCH_SIZE rows per chunk."""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+
+    count = 0
+    async for row in rows:
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, default=str))
+            buffer.write("\n")
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode()
+
+
+async def _gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compress a byte stream on the fly into a single gzip member."""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip header and trailer
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(
+    rows: AsyncIterator[dict],
+    fmt: str,
+    filename: str,
+    fieldnames: Sequence[str],
+    gzip: bool = False,
+) -> StreamingResponse:
+    """
+    Stream `rows` to the client as NDJSON or CSV without holding them in memory.
+
+    Args:
+        rows (AsyncIterator[dict]): Rows, typically straight off a server-side cursor.
+        fmt (str): "ndjson" or "csv".
+        filename (str): Download name without extension.
+        fieldnames (Sequence[str]): Column order (CSV header).
+        gzip (bool): Compress the body with Content-Encoding: gzip.
+
+    Returns:
+        StreamingResponse: The streaming download.
+    """
+    body = _encode_rows(rows, fmt, fieldnames)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    if gzip:
+        body = _gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
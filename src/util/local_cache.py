@@ -0,0 +1,109 @@
+import fnmatch
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.util.config import config
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    Bounded LRU cache with a TTL per entry, private to one worker process.
+
+    Meant to be used from the event loop only (no locking). Values are shared
+    between callers, treat them as read-only.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return default
+        expires, value = item
+        if expires <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def delete_pattern(self, pattern: str):
+        for key in [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# namespace (the part of a key before the first ":") -> its cache
+_namespaces: Dict[str, LocalCache] = {}
+
+
+def namespace_of(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def local_cache_for(key: str) -> LocalCache:
+    """The L1 cache holding `key`, sized by config.cache_local_namespaces."""
+    namespace = namespace_of(key)
+    cache = _namespaces.get(namespace)
+    if cache is None:
+        max_entries = config.cache_local_namespaces.get(namespace, config.cache_local_max_entries)
+        cache = LocalCache(namespace, max_entries, config.cache_local_ttl)
+        _namespaces[namespace] = cache
+    return cache
+
+
+def invalidate_local(key: Optional[str] = None, pattern: Optional[str] = None):
+    """Drop a key, every key matching a glob pattern, or everything when neither is given."""
+    if key is not None:
+        local_cache_for(key).delete(key)
+    elif pattern is not None:
+        for cache in _namespaces.values():
+            cache.delete_pattern(pattern)
+    else:
+        for cache in _namespaces.values():
+            cache.clear()
+
+
+def local_cache_stats() -> Dict[str, dict]:
+    return {name: cache.stats() for name, cache in _namespaces.items()}
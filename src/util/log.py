@@ -1,53 +1,189 @@
+import atexit
+import logging
 import os
-import logging 
-from rich.logging import RichHandler 
-# Determine the root directory of the project. 
+import queue
+import sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+from rich.logging import RichHandler
+
+from src.util.config import config
+
+# Determine the root directory of the project.
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOGS_DIR = os.path.join(ROOT_DIR, "logs")
 
-def setup_logger(name: str, file_path: str, level=logging.DEBUG, console_logging: bool = True) -> logging.Logger:
+LOG_FORMAT = '[%(asctime)s] [%(levelname)s] [%(request_id)s] %(name)s - %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# id of the request being handled, set by src.util.tracing.TracingMiddleware
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Loggers only put records on _log_queue (cheap, never blocks); one background
+# thread formats them and writes them to the files and the console.
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
+# logger name -> handlers that run on the listener thread
+_routes: Dict[str, List[logging.Handler]] = {}
+# log file name -> handler, loggers sharing a file share the handler
+_file_handlers: Dict[str, logging.Handler] = {}
+_console_handler: Optional[logging.Handler] = None
+
+
+class _RouteHandler(logging.Handler):
+    """Runs on the listener thread, hands each record to its logger's handlers."""
+
+    def handle(self, record: logging.LogRecord):
+        for handler in _routes.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord):
+        pass
+
+
+class _ThreadQueueHandler(QueueHandler):
+    """
+    QueueHandler for a listener in the same process: records are queued as
+    they are, so formatting happens on the listener thread instead of the
+    caller's. Do not mutate objects after passing them as log arguments.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _RequestIdFilter(logging.Filter):
+    """Stamps records with the current request id, contextvars are only readable here."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keeps the first and then every `every`-th DEBUG record from each call
+    site, so chatty debug lines in hot paths stay affordable. Other levels
+    always pass.
+    """
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._seen: Dict[Tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        site = (record.pathname, record.lineno)
+        seen = self._seen.get(site, 0)
+        self._seen[site] = seen + 1
+        return seen % self.every == 0
+
+
+def level_for(name: str) -> int:
+    """
+    Level for a logger: the longest matching module prefix in
+    config.log_levels (e.g. {"src.v1.auth": "INFO"}), else config.log_level.
+    """
+    match = ""
+    for prefix in config.log_levels:
+        if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > len(match):
+            match = prefix
+    level = config.log_levels[match] if match else config.log_level
+    return logging.getLevelName(level.upper()) if isinstance(level, str) else level
+
+
+def _get_console_handler() -> Optional[logging.Handler]:
+    global _console_handler
+    if _console_handler is None and config.log_console != "none":
+        if config.log_console == "plain":
+            # one line per record, no colour or layout work, for production
+            _console_handler = logging.StreamHandler(sys.stderr)
+            _console_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+        else:
+            _console_handler = RichHandler(
+                rich_tracebacks=True,
+                show_time=True,
+                show_level=True,
+                show_path=True
+            )
+    return _console_handler
+
+
+def _get_file_handler(file_path: str, file_format: str) -> logging.Handler:
+    handler = _file_handlers.get(file_path)
+    if handler is None:
+        os.makedirs(LOGS_DIR, exist_ok=True)
+        # Setup file handler (logs to logs/<file_path>)
+        handler = logging.FileHandler(os.path.join(LOGS_DIR, file_path))
+        handler.setFormatter(logging.Formatter(file_format, datefmt=LOG_DATE_FORMAT))
+        _file_handlers[file_path] = handler
+    return handler
+
+
+def _start_listener():
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_log_queue, _RouteHandler(), respect_handler_level=False)
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush every queued record and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logger(
+    name: str,
+    file_path: str,
+    level=None,
+    console_logging: bool = True,
+    file_format: str = LOG_FORMAT,
+) -> logging.Logger:
     """
-    Sets up a logger with:
+    Sets up a logger that queues its records for a background thread, which
+    writes them to:
     - File logging (plain text, no color)
-    - RichHandler for colored console output (optional)
+    - the console, rich or plain per config.log_console (optional)
     Only sets up handlers once per logger.
 
+    Log with %-style arguments (logger.debug("x=%s", x)) on hot paths, the
+    message is then only built if the record is emitted.
+
     Args:
         name (str): Logger name (usually module name).
         file_path (str): Log file name to store logs.
-        level (int): Logging level (e.g., logging.INFO).
+        level (int): Logging level, defaults to level_for(name).
         console_logging (bool): Enable console output. Defaults to True.
+        file_format (str): Format of the file lines, "%(message)s" for raw records.
 
     Returns:
         logging.Logger: Configured logger instance.
     """
     logger = logging.getLogger(name)
-    logger.setLevel(level)
+    logger.setLevel(level if level is not None else level_for(name))
 
     # Avoid adding multiple handlers on repeated calls
     if not logger.handlers:
-        os.makedirs(LOGS_DIR, exist_ok=True)
+        handlers = [_get_file_handler(file_path, file_format)]
+        console_handler = _get_console_handler() if console_logging else None
+        if console_handler is not None:
+            handlers.append(console_handler)
+        _routes[name] = handlers
 
-        # Setup file handler (logs to logs/<file_path>)
-        log_file_path = os.path.join(LOGS_DIR, file_path)
-        file_handler = logging.FileHandler(log_file_path)
-        file_handler.setLevel(level)
-        file_formatter = logging.Formatter(
-            '[%(asctime)s] [%(levelname)s] %(name)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
-
-        # Setup rich console handler (colored, timestamped output) if enabled
-        if console_logging:
-            console_handler = RichHandler(
-                rich_tracebacks=True,
-                show_time=True,
-                show_level=True,
-                show_path=True
-            )
-            console_handler.setLevel(level)
-            logger.addHandler(console_handler)
+        queue_handler = _ThreadQueueHandler(_log_queue)
+        queue_handler.addFilter(DebugSampler(config.log_debug_sample_every))
+        queue_handler.addFilter(_RequestIdFilter())
+        logger.addHandler(queue_handler)
+        _start_listener()
 
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,321 @@
+"""
+Prometheus text-format metrics without prometheus_client.
+
+Each worker keeps its own counters and histograms in memory, and collectors
+registered with register_collector() add point-in-time samples (pool sizes,
+cache counters, ...) when a snapshot is taken. With config.metrics_dir set,
+every worker writes its snapshot to <metrics_dir>/worker-<pid>.json every
+config.metrics_flush_interval seconds, and render_metrics() merges the files
+of all workers: counters and histograms are summed, gauges are reported per
+worker (label `worker`). Gauges of a worker that stopped writing are dropped,
+its counters are kept so totals never go backwards. Clear metrics_dir when
+deploying, as with prometheus_client's multiprocess mode.
+"""
+import asyncio
+import bisect
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from src.util.config import config
+from src.util.log import setup_logger
+
+logger = setup_logger(__name__, "metrics.log")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+Labels = Dict[str, str]
+# a collector returns metric families:
+# {"name", "type": "counter" | "gauge", "help", "samples": [(labels, value)]}
+Collector = Callable[[], List[dict]]
+
+_metrics: List["_Metric"] = []
+_collectors: List[Collector] = []
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _metrics.append(self)
+
+    def _key(self, labels: Labels) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.help,
+            "samples": [[dict(zip(self.labelnames, key)), value] for key, value in self._values.items()],
+        }
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.help,
+            "buckets": list(self.buckets),
+            "samples": [
+                [dict(zip(self.labelnames, key)), list(counts), total, count]
+                for key, (counts, total, count) in self._values.items()
+            ],
+        }
+
+
+def register_collector(collector: Collector):
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def snapshot() -> dict:
+    """This worker's metrics as a JSON-serialisable dict."""
+    families = {metric.name: metric.snapshot() for metric in _metrics}
+    for collector in _collectors:
+        try:
+            for family in collector():
+                families[family["name"]] = {
+                    "type": family["type"],
+                    "help": family["help"],
+                    "samples": [[labels, value] for labels, value in family["samples"]],
+                }
+        except Exception as e:
+            logger.error(f"Metrics collector {collector} failed: {e}")
+    return {"pid": os.getpid(), "time": time.time(), "metrics": families}
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(config.metrics_dir, f"worker-{pid}.json")
+
+
+def _write_snapshot(data: dict):
+    os.makedirs(config.metrics_dir, exist_ok=True)
+    path = _snapshot_path(data["pid"])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _read_snapshots(own: dict) -> List[dict]:
+    snapshots = [own]
+    if not config.metrics_dir or not os.path.isdir(config.metrics_dir):
+        return snapshots
+    for filename in os.listdir(config.metrics_dir):
+        if not (filename.startswith("worker-") and filename.endswith(".json")):
+            continue
+        if filename == f"worker-{own['pid']}.json":
+            continue
+        try:
+            with open(os.path.join(config.metrics_dir, filename)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable metrics file {filename}: {e}")
+    return snapshots
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _merge(snapshots: Iterable[dict]) -> Dict[str, dict]:
+    stale_before = time.time() - 3 * config.metrics_flush_interval
+    merged: Dict[str, dict] = {}
+    for data in snapshots:
+        live = data["time"] >= stale_before
+        for name, family in data["metrics"].items():
+            target = merged.setdefault(
+                name, {"type": family["type"], "help": family["help"], "buckets": family.get("buckets"), "samples": {}}
+            )
+            samples = target["samples"]
+            if family["type"] == "gauge":
+                if not live:
+                    continue
+                for labels, value in family["samples"]:
+                    labels = {**labels, "worker": str(data["pid"])}
+                    samples[tuple(sorted(labels.items()))] = value
+            elif family["type"] == "counter":
+                for labels, value in family["samples"]:
+                    key = tuple(sorted(labels.items()))
+                    samples[key] = samples.get(key, 0.0) + value
+            elif family["type"] == "histogram":
+                for labels, counts, total, count in family["samples"]:
+                    key = tuple(sorted(labels.items()))
+                    entry = samples.get(key)
+                    if entry is None:
+                        samples[key] = [list(counts), total, count]
+                    else:
+                        entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                        entry[1] += total
+                        entry[2] += count
+    return merged
+
+
+def _render(merged: Dict[str, dict]) -> str:
+    lines = []
+    for name in sorted(merged):
+        family = merged[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for key, value in family["samples"].items():
+            labels = dict(key)
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip([*family["buckets"], float("inf")], counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def render_metrics(own: dict) -> str:
+    """
+    Prometheus exposition of every worker's metrics, `own` being this
+    worker's snapshot(). Does file I/O, call it off the event loop; take the
+    snapshot on the loop, the metrics it reads are updated there.
+    """
+    if config.metrics_dir:
+        _write_snapshot(own)
+    return _render(_merge(_read_snapshots(own)))
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template, method and status code.", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and method.", ("method", "route")
+)
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds", "Redis round trip latency by command.", ("command",), buckets=FAST_BUCKETS
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task.", buckets=FAST_BUCKETS
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status of every HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the router stores the matched route in the scope, using its
+            # template keeps ids out of the label values
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=route_path)
+            HTTP_REQUESTS.inc(method=method, route=route_path, status=str(status_code))
+
+
+_background: List[asyncio.Task] = []
+
+
+async def _measure_event_loop_lag():
+    interval = config.event_loop_lag_interval
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - expected))
+
+
+async def _flush_periodically():
+    while True:
+        await asyncio.sleep(config.metrics_flush_interval)
+        try:
+            await asyncio.to_thread(_write_snapshot, snapshot())
+        except Exception as e:
+            logger.error(f"Failed to write metrics snapshot: {e}")
+
+
+async def start_metrics():
+    if _background:
+        return
+    _background.append(asyncio.create_task(_measure_event_loop_lag()))
+    if config.metrics_dir:
+        _background.append(asyncio.create_task(_flush_periodically()))
+
+
+async def stop_metrics():
+    for task in _background:
+        task.cancel()
+    for task in _background:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _background.clear()
+    if config.metrics_dir:
+        try:
+            # keep this worker's final counters for the next scrape
+            _write_snapshot(snapshot())
+        except Exception as e:
+            logger.error(f"Failed to write final metrics snapshot: {e}")
@@ -0,0 +1,70 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, NamedTuple, Optional, Sequence
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.v1.base.exception import BadRequest
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class Page(NamedTuple):
+    items: Sequence[Any]
+    next_cursor: Optional[str]
+    limit: int
+
+
+def encode_cursor(created_at: datetime, id: uuid.UUID) -> str:
+    """Opaque token pointing just after the row with this (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), str(id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), uuid.UUID(id)
+    except (ValueError, TypeError):
+        raise BadRequest("Invalid pagination cursor")
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    model,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Page:
+    """
+    Run `stmt` as one keyset page ordered by (created_at, id).
+
+    Args:
+        db (AsyncSession): Session to execute on.
+        stmt (Select): Query selecting `model` entities, without ordering or limit.
+        model: Mapped class the page is keyed on (any BaseModel subclass).
+        cursor (str, optional): next_cursor from the previous page.
+        limit (int): Page size, capped at MAX_PAGE_SIZE.
+
+    Returns:
+        Page: The rows plus the cursor for the next page (None on the last page).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    stmt = stmt.order_by(model.created_at, model.id).limit(limit + 1)
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(model.created_at, model.id) > tuple_(created_at, id))
+
+    result = await db.execute(stmt)
+    rows = result.scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return Page(items=rows, next_cursor=next_cursor, limit=limit)
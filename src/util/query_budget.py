@@ -0,0 +1,169 @@
+"""
+Statement counting per request, to catch N+1 patterns and query regressions.
+
+With config.query_budget_mode set to "warn" or "raise", QueryCountMiddleware
+counts the statements each request executes (dependencies included) through
+the query observers in src.util.db. At the end of the request it reports any
+statement that ran at least config.n_plus_one_threshold times with different
+parameters. Routes declare how many statements they may run with
+@query_budget(n); going over is logged ("warn") or fails the request
+("raise", for development and CI). With the default "off" nothing is
+recorded.
+
+Tests use assert_max_queries(n) around a call regardless of the mode.
+"""
+import functools
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from src.util.config import config
+from src.util.db import add_query_observer, remove_query_observer
+from src.util.log import setup_logger
+
+logger = setup_logger(__name__, "query_budget.log")
+
+# distinct parameter sets remembered per statement, enough to tell a loop apart
+MAX_TRACKED_PARAMS = 64
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryLog:
+    """Statements executed in one request (or one assert_max_queries block)."""
+
+    def __init__(self):
+        self.count = 0
+        # statement -> [executions, hashes of the distinct parameter sets]
+        self.statements: Dict[str, List[Any]] = {}
+
+    def record(self, statement: str, parameters: Any):
+        self.count += 1
+        entry = self.statements.get(statement)
+        if entry is None:
+            entry = self.statements[statement] = [0, set()]
+        entry[0] += 1
+        params: Set[int] = entry[1]
+        if len(params) < MAX_TRACKED_PARAMS:
+            params.add(hash(repr(parameters)))
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int, int]]:
+        """(statement, executions, distinct parameter sets) of likely N+1 patterns."""
+        return [
+            (statement, executions, len(params))
+            for statement, (executions, params) in self.statements.items()
+            if executions >= threshold and len(params) > 1
+        ]
+
+
+_query_log: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+
+
+def _observe(statement: str, parameters: Any, started_ns: int, ended_ns: int):
+    log = _query_log.get()
+    if log is not None:
+        log.record(statement, parameters)
+
+
+add_query_observer(_observe)
+
+
+def _report_repeated(log: QueryLog, where: str):
+    for statement, executions, distinct in log.repeated(config.n_plus_one_threshold):
+        logger.warning(
+            "Possible N+1 in %s: statement ran %d times with %d different parameter sets: %s",
+            where, executions, distinct, " ".join(statement.split())[:300],
+        )
+
+
+def _enforce(log: QueryLog, max_queries: int, where: str, mode: str):
+    if log.count <= max_queries:
+        return
+    message = f"{where} ran {log.count} statements, budget is {max_queries}"
+    if mode == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def query_budget(max_queries: int) -> Callable:
+    """
+    Declare the most statements a route may execute, dependencies included.
+    Place it under the router decorator:
+
+        @router.get("/students")
+        @query_budget(3)
+        async def fetch_all_students(...):
+    """
+
+    def decorator(endpoint: Callable) -> Callable:
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            mode = config.query_budget_mode
+            if mode == "off":
+                return await endpoint(*args, **kwargs)
+            log = _query_log.get()
+            token = None
+            if log is None:
+                # not under the middleware, only the endpoint body is counted
+                log = QueryLog()
+                token = _query_log.set(log)
+            try:
+                result = await endpoint(*args, **kwargs)
+            finally:
+                if token is not None:
+                    _query_log.reset(token)
+            _enforce(log, max_queries, endpoint.__qualname__, mode)
+            return result
+
+        wrapper.query_budget = max_queries
+        return wrapper
+
+    return decorator
+
+
+@asynccontextmanager
+async def assert_max_queries(max_queries: int) -> AsyncIterator[QueryLog]:
+    """
+    Test helper: fail with QueryBudgetExceeded if more than `max_queries`
+    statements run while the block is open, and report N+1 patterns like the
+    middleware does. Every statement of the process is counted, keep other
+    traffic away from the block.
+
+        async with assert_max_queries(4) as queries:
+            response = await client.post("/api/v1/auth/login", json=credentials)
+    """
+    log = QueryLog()
+
+    def observer(statement: str, parameters: Any, started_ns: int, ended_ns: int):
+        log.record(statement, parameters)
+
+    add_query_observer(observer)
+    try:
+        yield log
+    finally:
+        remove_query_observer(observer)
+    _report_repeated(log, "assert_max_queries block")
+    _enforce(log, max_queries, "assert_max_queries block", "raise")
+
+
+class QueryCountMiddleware:
+    """ASGI middleware giving each HTTP request a QueryLog, see the module docstring."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or config.query_budget_mode == "off":
+            await self.app(scope, receive, send)
+            return
+        log = QueryLog()
+        token = _query_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _query_log.reset(token)
+            where = f"{scope['method']} {scope['path']}"
+            logger.debug("%s executed %d statements", where, log.count)
+            _report_repeated(log, where)
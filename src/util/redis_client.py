@@ -1,8 +1,18 @@
 # redis_client.py
+import asyncio
 import json
+import math
+import random
+import time
+import uuid
 import redis.asyncio as redis
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Mapping, Optional, Sequence
+from src.util.cache_codec import codec_for, decode
 from src.util.config import config
+from src.util.local_cache import invalidate_local, local_cache_for, local_cache_stats, namespace_of
+from src.util.metrics import REDIS_LATENCY
+from src.util.tracing import record_span
 
 from src.util.log import setup_logger
 logger = setup_logger(__name__, "redis.log")
@@ -10,14 +20,74 @@ logger = setup_logger(__name__, "redis.log")
 CACHE_TTL = 60 * 2  # 10 mins
 REDIS_URL = config.redis_url
 
+class _TracedPipeline(redis.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.time_ns()
+        commands = len(self.command_stack)
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            ended = time.time_ns()
+            REDIS_LATENCY.observe((ended - started) / 1e9, command="PIPELINE")
+            record_span("cache", "redis.pipeline", started, ended, **{"db.redis.commands": commands})
+
+
+class _TracedRedis(redis.Redis):
+    """Redis client that records every round trip in the latency histogram and the request's trace."""
+
+    async def execute_command(self, *args, **options):
+        started = time.time_ns()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            ended = time.time_ns()
+            command = str(args[0]).upper()
+            REDIS_LATENCY.observe((ended - started) / 1e9, command=command)
+            record_span("cache", f"redis.{command}", started, ended)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> "_TracedPipeline":
+        return _TracedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
 _redis: Optional[redis.Redis] = None
+# separate client for pub/sub subscriptions, which wait for messages
+# indefinitely and must not be cut off by redis_socket_timeout
+_blocking_redis: Optional[redis.Redis] = None
+# client for XREAD BLOCK loops: the block is bounded, so a read that outlives
+# it by redis_socket_timeout fails instead of hanging on a dead connection
+_stream_redis: Optional[redis.Redis] = None
 
 async def setup_redis() -> redis.Redis:
-    global _redis
+    global _redis, _blocking_redis, _stream_redis
     if _redis is None:
         logger.info(f"Initializing Redis connection to {REDIS_URL}")
         try:
-            _redis = redis.from_url(REDIS_URL, decode_responses=True)
+            # values are binary (see src/util/cache_codec.py), callers decode
+            pool = redis.BlockingConnectionPool.from_url(
+                REDIS_URL,
+                decode_responses=False,
+                max_connections=config.redis_max_connections,
+                timeout=config.redis_pool_timeout,
+                socket_timeout=config.redis_socket_timeout,
+                socket_connect_timeout=config.redis_socket_connect_timeout,
+                health_check_interval=config.redis_health_check_interval,
+            )
+            _redis = _TracedRedis(connection_pool=pool)
+            _blocking_redis = redis.from_url(
+                REDIS_URL,
+                decode_responses=False,
+                socket_connect_timeout=config.redis_socket_connect_timeout,
+                socket_keepalive=True,
+                health_check_interval=config.redis_health_check_interval,
+            )
+            _stream_redis = redis.from_url(
+                REDIS_URL,
+                decode_responses=False,
+                socket_timeout=config.redis_stream_block_ms / 1000 + config.redis_socket_timeout,
+                socket_connect_timeout=config.redis_socket_connect_timeout,
+                socket_keepalive=True,
+                health_check_interval=config.redis_health_check_interval,
+            )
             logger.info("Redis connection established successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Redis connection: {str(e)}")
@@ -30,43 +100,330 @@ async def get_redis() -> redis.Redis:
         raise RuntimeError("Redis has not been initialized. Call setup_redis() first.")
     return _redis
 
+async def get_blocking_redis() -> redis.Redis:
+    """Client for pub/sub subscriptions, which block indefinitely."""
+    if _blocking_redis is None:
+        logger.error("Redis connection not initialized")
+        raise RuntimeError("Redis has not been initialized. Call setup_redis() first.")
+    return _blocking_redis
+
+async def get_stream_redis() -> redis.Redis:
+    """Client for XREAD loops, block at most config.redis_stream_block_ms per call."""
+    if _stream_redis is None:
+        logger.error("Redis connection not initialized")
+        raise RuntimeError("Redis has not been initialized. Call setup_redis() first.")
+    return _stream_redis
+
+async def close_redis():
+    global _redis, _blocking_redis, _stream_redis
+    for client in (_redis, _blocking_redis, _stream_redis):
+        if client is not None:
+            await client.aclose()
+    _redis = _blocking_redis = _stream_redis = None
+
+
+@asynccontextmanager
+async def redis_pipeline(transaction: bool = False) -> AsyncIterator[redis.client.Pipeline]:
+    """
+    Queue commands on a pipeline and send them in one round trip when the
+    block exits. Call `await pipe.execute()` inside the block to read results.
+    """
+    redis_conn = await get_redis()
+    async with redis_conn.pipeline(transaction=transaction) as pipe:
+        yield pipe
+        await pipe.execute()
+
+
+def redis_pool_stats() -> Dict[str, int]:
+    if _redis is None:
+        return {}
+    pool = _redis.connection_pool
+    return {
+        "max_connections": pool.max_connections,
+        "in_use": len(getattr(pool, "_in_use_connections", ())),
+        "idle": len([c for c in getattr(pool, "_available_connections", ()) if c is not None]),
+    }
+
+
+# Two-tier cache: every worker keeps a small L1 (src/util/local_cache.py) in
+# front of Redis. Writes and deletes publish the key on CACHE_INVALIDATION_CHANNEL
+# so the other workers drop their L1 copy, and L1 entries expire after at most
+# config.cache_local_ttl seconds in case a message is missed. L1 holds the
+# encoded bytes as stored in Redis and every read decodes them, so callers
+# get their own copy and can never change what other requests see.
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+WORKER_ID = uuid.uuid4().hex
+RESUBSCRIBE_DELAY = 5
+
+# namespace -> Redis (L2) hit/miss counters
+_l2_stats: Dict[str, Dict[str, int]] = {}
+_invalidation_listener: Optional[asyncio.Task] = None
+
+
+def _count_l2(key: str, hit: bool):
+    counters = _l2_stats.setdefault(namespace_of(key), {"hits": 0, "misses": 0})
+    counters["hits" if hit else "misses"] += 1
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Per-namespace L1 and L2 (Redis) hit/miss counters for this worker."""
+    stats = {name: {"l1": l1} for name, l1 in local_cache_stats().items()}
+    for name, counters in _l2_stats.items():
+        lookups = counters["hits"] + counters["misses"]
+        stats.setdefault(name, {})["l2"] = {
+            **counters,
+            "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
+    return stats
+
+
+def _invalidation_message(key: Optional[str] = None, pattern: Optional[str] = None) -> str:
+    return json.dumps({"origin": WORKER_ID, "key": key, "pattern": pattern})
+
+
+async def _listen_for_invalidations():
+    while True:
+        try:
+            redis_conn = await get_blocking_redis()
+            async with redis_conn.pubsub() as pubsub:
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                # anything could have changed while we were not subscribed
+                invalidate_local()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data["origin"] == WORKER_ID:
+                        continue
+                    invalidate_local(key=data["key"], pattern=data["pattern"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Cache invalidation listener failed, retrying: {e}")
+            invalidate_local()
+            await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+
+async def start_invalidation_listener():
+    global _invalidation_listener
+    if _invalidation_listener is None:
+        _invalidation_listener = asyncio.create_task(_listen_for_invalidations())
+
+
+async def stop_invalidation_listener():
+    global _invalidation_listener
+    if _invalidation_listener is not None:
+        _invalidation_listener.cancel()
+        try:
+            await _invalidation_listener
+        except asyncio.CancelledError:
+            pass
+        _invalidation_listener = None
+
+
+# Entries written by get_or_fetch_cache carry their own soft expiry so they can
+# be served stale while one caller recomputes them.
+STALE_TTL = 60  # seconds an entry may be served past its ttl while it is refreshed
+XFETCH_BETA = 1.0  # >1 refreshes earlier, <1 later
+LOCK_TIMEOUT_MS = 10_000
+LOCK_WAIT = 5.0  # seconds a miss waits for another worker's recompute
+LOCK_POLL_INTERVAL = 0.05
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# key -> future of the fetch currently running in this worker
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def _encode(key: str, value) -> bytes:
+    return codec_for(namespace_of(key)).encode(value)
+
+
+def _decode_entry(cached) -> Optional[dict]:
+    if not cached:
+        return None
+    try:
+        entry = decode(cached)
+    except ValueError:
+        return None
+    # anything not written by get_or_fetch_cache is treated as a miss
+    if isinstance(entry, dict) and entry.get("_swr") == 1:
+        return entry
+    return None
+
+
+def _unwrap(data):
+    """
+    What plain readers (get_cache, get_many) return for a stored value: the
+    value itself for entries written by get_or_fetch_cache, which keep it
+    inside their refresh bookkeeping.
+    """
+    if isinstance(data, dict) and data.get("_swr") == 1:
+        return data["value"]
+    return data
 
-async def get_or_fetch_cache(key: str, fetch_callback: callable, ttl: int = CACHE_TTL):
-    redis = await get_redis()
-    logger.debug(f"Attempting to get cached data for key: {key}")
 
-    cached = await redis.get(key)
-    if cached:
-        logger.debug(f"Cache hit for key: {key}, value {cached}")
-        return json.loads(cached)
+def _refresh_early(entry: dict, now: float) -> bool:
+    """
+    Probabilistic early expiration (XFetch): the closer the entry is to its
+    expiry and the longer it took to compute, the likelier a caller is picked
+    to recompute it before it expires.
+    """
+    return now - entry["delta"] * XFETCH_BETA * math.log(random.random() or 1e-12) >= entry["expires"]
+
+
+async def _acquire_lock(redis_conn: redis.Redis, key: str) -> Optional[str]:
+    token = uuid.uuid4().hex
+    if await redis_conn.set(f"lock:{key}", token, nx=True, px=LOCK_TIMEOUT_MS):
+        return token
+    return None
+
+
+async def _release_lock(redis_conn: redis.Redis, key: str, token: str):
+    try:
+        await redis_conn.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+    except Exception as e:
+        # the lock expires on its own
+        logger.error(f"Failed to release lock for key {key}: {e}")
 
-    # fetch fresh data
-    logger.debug("catch miss.....")
+
+async def _compute_and_store(redis_conn: redis.Redis, key: str, fetch_callback: callable, ttl: int, stale_ttl: int):
+    started = time.monotonic()
     fresh = await fetch_callback()
-    logger.debug(f"Fetched fresh data: {fresh}")
-
-    # set cache
-    await redis.set(key, json.dumps(fresh), ex=ttl)
-    
-    # verify immediately
-    verify = await redis.get(key)
-    if not verify:
-        logger.error(f"Key {key} failed to write!")
+    entry = {
+        "_swr": 1,
+        "value": fresh,
+        "delta": time.monotonic() - started,
+        "expires": time.time() + ttl,
+    }
+    payload = _encode(key, entry)
+    async with redis_conn.pipeline(transaction=False) as pipe:
+        pipe.set(key, payload, ex=ttl + stale_ttl)
+        pipe.publish(CACHE_INVALIDATION_CHANNEL, _invalidation_message(key=key))
+        await pipe.execute()
+    local_cache_for(key).set(key, payload, ttl + stale_ttl)
+    return fresh
+
+
+class _LeaderCancelled(Exception):
+    """The caller running a shared fetch was cancelled, a waiter takes over."""
+
+
+async def _single_flight(key: str, compute: Callable[[], Awaitable]):
+    """Run `compute` once per key in this worker, concurrent callers share the result."""
+    while True:
+        running = _inflight.get(key)
+        if running is None:
+            break
+        try:
+            return await asyncio.shield(running)
+        except _LeaderCancelled:
+            # the first waiter to get here runs the fetch, the rest wait on it
+            continue
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await compute()
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        # our client went away, that must not cancel the other callers
+        future.set_exception(_LeaderCancelled())
+        future.exception()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # retrieved by us, waiters re-raise it
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+async def get_or_fetch_cache(key: str, fetch_callback: callable, ttl: int = CACHE_TTL, stale_ttl: int = STALE_TTL):
+    """
+    Return the cached value for `key`, computing it with `fetch_callback` on a miss.
+
+    Concurrent misses are collapsed: within a worker they share one fetch, and
+    across workers a Redis lock lets one worker fetch while the others wait
+    for its result. Entries are recomputed slightly before they expire
+    (probabilistically) and may be served up to `stale_ttl` seconds past
+    `ttl` while a single caller refreshes them.
+    """
+    redis_conn = await get_redis()
+    local = local_cache_for(key)
+    raw = local.get(key)
+    if raw is not None:
+        entry = _decode_entry(raw)
     else:
-        logger.debug(f"Key {key} written successfully and readable: {verify}")
+        raw = await redis_conn.get(key)
+        entry = _decode_entry(raw)
+        _count_l2(key, entry is not None)
+        if entry is not None:
+            local.set(key, raw)
 
-    return fresh
+    if entry is not None:
+        now = time.time()
+        if now < entry["expires"] and not _refresh_early(entry, now):
+            return entry["value"]
+        # stale or picked for early refresh: one caller recomputes, everyone
+        # else keeps serving what is cached
+        if key in _inflight:
+            return entry["value"]
+        token = await _acquire_lock(redis_conn, key)
+        if token is None:
+            return entry["value"]
+        try:
+            logger.debug("Refreshing cache for key: %s", key)
+            return await _single_flight(
+                key, lambda: _compute_and_store(redis_conn, key, fetch_callback, ttl, stale_ttl)
+            )
+        except Exception as e:
+            logger.error(f"Refresh failed for key {key}, serving stale value: {e}")
+            return entry["value"]
+        finally:
+            await _release_lock(redis_conn, key, token)
+
+    async def fetch_on_miss():
+        logger.debug("Cache miss for key: %s", key)
+        token = await _acquire_lock(redis_conn, key)
+        if token is None:
+            # another worker is computing it, wait for its result
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                entry = _decode_entry(await redis_conn.get(key))
+                if entry is not None:
+                    return entry["value"]
+            logger.warning(f"Timed out waiting for another worker to fill key {key}")
+        try:
+            return await _compute_and_store(redis_conn, key, fetch_callback, ttl, stale_ttl)
+        finally:
+            if token is not None:
+                await _release_lock(redis_conn, key, token)
+
+    return await _single_flight(key, fetch_on_miss)
 
 async def set_cache(key: str, data:dict, ttl: int = CACHE_TTL) -> bool:
     """
-    Store `data` (JSON-serializable) under `key` with expiration `ttl` seconds.
+    Store `data` (JSON-serializable) under `key` with expiration `ttl` seconds,
+    encoded with the codec configured for the key's namespace.
     Returns True on success, False on failure.
     """
     try:
         redis_conn = await get_redis()
-        payload = json.dumps(data)
-        await redis_conn.set(key, payload, ex=ttl)
-        logger.debug(f"Set cache for key={key} ttl={ttl} payload={payload}")
+        payload = _encode(key, data)
+        async with redis_conn.pipeline(transaction=False) as pipe:
+            pipe.set(key, payload, ex=ttl)
+            pipe.publish(CACHE_INVALIDATION_CHANNEL, _invalidation_message(key=key))
+            await pipe.execute()
+        local_cache_for(key).set(key, payload, ttl)
+        logger.debug("Set cache for key=%s ttl=%s", key, ttl)
         return True
     except Exception as e:
         logger.error(f"Failed to write cache for key {key}: {e}")
@@ -74,25 +431,165 @@ async def set_cache(key: str, data:dict, ttl: int = CACHE_TTL) -> bool:
 
 async def get_cache(key: str) -> Optional[dict]:
     """
-    Retrieve cached data for `key`.
+    Retrieve cached data for `key`, from this worker's L1 when possible.
     Returns the deserialized JSON data if found, None otherwise.
     """
+    local = local_cache_for(key)
+    cached = local.get(key)
+    if cached is not None:
+        return _unwrap(decode(cached))
     try:
         redis_conn = await get_redis()
         cached = await redis_conn.get(key)
+        _count_l2(key, bool(cached))
         if cached:
-            logger.debug(f"Cache hit for key={key}, value={cached}")
-            return json.loads(cached)
+            logger.debug("Cache hit for key=%s", key)
+            data = decode(cached)
+            local.set(key, cached)
+            return _unwrap(data)
         else:
-            logger.debug(f"Cache miss for key={key}")
+            logger.debug("Cache miss for key=%s", key)
             return None
     except Exception as e:
         logger.error(f"Failed to get cache for key {key}: {e}")
         return None
 
+async def get_many(keys: Sequence[str]) -> Dict[str, Any]:
+    """
+    Look up several keys at once: L1 first, then a single MGET for the rest.
+    Returns {key: value} for the keys that were found.
+    """
+    found: Dict[str, Any] = {}
+    missing = []
+    for key in keys:
+        raw = local_cache_for(key).get(key)
+        if raw is not None:
+            found[key] = _unwrap(decode(raw))
+        else:
+            missing.append(key)
+    if not missing:
+        return found
+    try:
+        redis_conn = await get_redis()
+        raw_values = await redis_conn.mget(missing)
+    except Exception as e:
+        logger.error(f"Failed to get cache for {len(missing)} keys: {e}")
+        return found
+    for key, raw in zip(missing, raw_values):
+        _count_l2(key, raw is not None)
+        if raw is None:
+            continue
+        try:
+            value = decode(raw)
+        except ValueError as e:
+            logger.warning(f"Undecodable cache entry for key {key}: {e}")
+            continue
+        found[key] = _unwrap(value)
+        local_cache_for(key).set(key, raw)
+    logger.debug("get_many: %d/%d keys found", len(found), len(keys))
+    return found
+
+async def set_many(items: Mapping[str, Any], ttl: int = CACHE_TTL) -> bool:
+    """
+    Store every key/value of `items` with expiration `ttl` seconds in one round trip.
+    Returns True on success, False on failure.
+    """
+    if not items:
+        return True
+    try:
+        payloads = {key: _encode(key, data) for key, data in items.items()}
+        async with redis_pipeline() as pipe:
+            for key, payload in payloads.items():
+                pipe.set(key, payload, ex=ttl)
+                pipe.publish(CACHE_INVALIDATION_CHANNEL, _invalidation_message(key=key))
+        for key, payload in payloads.items():
+            local_cache_for(key).set(key, payload, ttl)
+        logger.debug("Set cache for %d keys ttl=%s", len(items), ttl)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to write cache for {len(items)} keys: {e}")
+        return False
+
 async def key_exist(key:str):
+    # a value this worker cached for the key answers it (writes and deletes
+    # invalidate it); the answer itself is not cached, a key deleted or
+    # expired in redis must not keep reporting as present
+    if local_cache_for(key).get(key) is not None:
+        return True
     redis = await get_redis()
     exist = await redis.exists(key)
-    if exist:
-        return True
-    return False
\ No newline at end of file
+    _count_l2(key, bool(exist))
+    return bool(exist)
+
+
+async def delete_cache(*keys: str) -> int:
+    """Delete `keys`, returns how many existed."""
+    if not keys:
+        return 0
+    for key in keys:
+        local_cache_for(key).delete(key)
+    try:
+        redis_conn = await get_redis()
+        async with redis_conn.pipeline(transaction=False) as pipe:
+            pipe.unlink(*keys)
+            for key in keys:
+                pipe.publish(CACHE_INVALIDATION_CHANNEL, _invalidation_message(key=key))
+            deleted, *_ = await pipe.execute()
+        return deleted
+    except Exception as e:
+        logger.error(f"Failed to delete cache keys {keys}: {e}")
+        return 0
+
+
+async def delete_many(keys: Iterable[str]) -> int:
+    """Delete `keys` in one round trip, returns how many existed."""
+    return await delete_cache(*keys)
+
+
+# generation counters outlive every entry keyed by them by far
+GENERATION_TTL = 60 * 60 * 24
+
+
+async def get_generation(key: str) -> int:
+    """Current value of a counter bumped with bump_generation, 0 if never bumped."""
+    try:
+        redis_conn = await get_redis()
+        value = await redis_conn.get(key)
+        return int(value) if value else 0
+    except Exception as e:
+        logger.error(f"Failed to read generation {key}: {e}")
+        return 0
+
+
+async def bump_generation(key: str, ttl: int = GENERATION_TTL) -> int:
+    """
+    Increment a generation counter. Cache keys that embed the generation are
+    invalidated all at once, without scanning for them.
+    """
+    redis_conn = await get_redis()
+    async with redis_conn.pipeline(transaction=True) as pipe:
+        pipe.incr(key)
+        pipe.expire(key, ttl)
+        generation, _ = await pipe.execute()
+    return generation
+
+
+async def delete_pattern(pattern: str, batch_size: int = 500) -> int:
+    """Delete every key matching `pattern` (SCAN based, never blocks the server like KEYS)."""
+    deleted = 0
+    invalidate_local(pattern=pattern)
+    try:
+        redis_conn = await get_redis()
+        batch = []
+        async for key in redis_conn.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await redis_conn.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await redis_conn.unlink(*batch)
+        await redis_conn.publish(CACHE_INVALIDATION_CHANNEL, _invalidation_message(pattern=pattern))
+        logger.debug(f"Deleted {deleted} keys matching {pattern}")
+    except Exception as e:
+        logger.error(f"Failed to delete keys matching {pattern}: {e}")
+    return deleted
@@ -1,13 +1,65 @@
-from typing import Optional, Any
-from fastapi.responses import JSONResponse
-from fastapi import HTTPException
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Optional
+from fastapi.responses import JSONResponse, Response
+from fastapi import HTTPException, Request
 from fastapi.encoders import jsonable_encoder
-from src.v1.base.schema import ErrorResponse, SuccessResponse
+from redis.exceptions import RedisError
+from src.util.log import setup_logger
+from src.util.pagination import Page
+from src.util.redis_client import CACHE_TTL, get_or_fetch_cache
+from src.util.tracing import span
+from src.v1.base.schema import ErrorResponse, PaginatedResponse, SuccessResponse
 
-def success_response(status_code: int, message: str="success", data: Optional[Any] = None):
-    '''Returns a JSON response for success responses'''
-    response_content = SuccessResponse(message=message, data=data)
-    return JSONResponse(status_code=status_code, content=jsonable_encoder(response_content.model_dump()))
+logger = setup_logger(__name__, "response.log")
+
+def success_content(message: str="success", data: Optional[Any] = None, page: Optional[Page] = None) -> dict:
+    '''Builds the JSON-ready body of a success response, with next_cursor/limit when `page` is given'''
+    with span("serialize", "response.encode"):
+        if page is not None:
+            response_content = PaginatedResponse(message=message, data=data, next_cursor=page.next_cursor, limit=page.limit)
+        else:
+            response_content = SuccessResponse(message=message, data=data)
+        return jsonable_encoder(response_content.model_dump())
+
+def success_response(status_code: int, message: str="success", data: Optional[Any] = None, page: Optional[Page] = None):
+    '''Returns a JSON response for success responses, with next_cursor/limit when `page` is given'''
+    content = success_content(message, data, page)
+    with span("serialize", "response.render"):
+        return JSONResponse(status_code=status_code, content=content)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+async def cached_response(request: Request, key: str, build_content: Callable[[], Awaitable[dict]], ttl: int = CACHE_TTL) -> Response:
+    '''
+    Serves a GET endpoint from Redis: the final serialised body is cached under
+    `key` together with a strong ETag, so repeat requests skip the database and
+    serialisation, and a matching If-None-Match is answered with 304.
+    `build_content` produces the body (see success_content) on a miss.
+    '''
+    async def fetch():
+        content = await build_content()
+        with span("serialize", "response.render"):
+            body = json.dumps(content, separators=(",", ":"))
+        etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+        return {"etag": etag, "body": body}
+
+    try:
+        entry = await get_or_fetch_cache(key, fetch, ttl)
+    except (RedisError, RuntimeError) as e:
+        # cache unavailable, still answer the request
+        logger.error(f"Response cache unavailable for key {key}: {e}")
+        entry = await fetch()
+
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if _etag_matches(request, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
 
 def error_response(status_code: int, message: str, error_code: Optional[str] = None, resolution: Optional[str] = None, data: Optional[Any] = None):
     '''Returns a JSON response for error responses'''
@@ -0,0 +1,155 @@
+"""
+Slow-query log.
+
+Opt-in with config.slow_query_threshold_ms. Every statement slower than the
+threshold is written to logs/slow_query.log with its duration, redacted
+parameters and the application function that issued it. Slow SELECTs are
+also re-run as EXPLAIN (ANALYZE, BUFFERS) in a background task, on their own
+connection to the read engine and inside a transaction that is rolled back;
+at most one plan per statement every config.slow_query_explain_interval
+seconds and config.slow_query_explain_per_minute plans overall. Statements
+that take row locks are never explained.
+"""
+import asyncio
+import contextvars
+from collections import deque
+import datetime
+import decimal
+import os
+import re
+import sys
+import time
+import uuid
+from typing import Any, Deque, Dict, Set
+
+from greenlet import getcurrent
+
+from src.util.config import config
+from src.util.db import add_query_observer, read_engine
+from src.util.log import request_id_var, setup_logger
+
+logger = setup_logger(__name__, "slow_query.log", console_logging=False)
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# frames in these modules are plumbing, the call site is whoever called them
+_PLUMBING_DIRS = (os.path.join(SRC_DIR, "util"),)
+_EXPLAINABLE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+_LOCKING = re.compile(r"\bFOR\s+(UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)\b", re.IGNORECASE)
+_PLAIN_TYPES = (int, float, bool, decimal.Decimal, uuid.UUID, datetime.date, datetime.time, datetime.timedelta)
+
+# set inside the EXPLAIN task so its own statements are not reported
+_explaining: contextvars.ContextVar[bool] = contextvars.ContextVar("explaining_slow_query", default=False)
+# statement -> monotonic time of its last EXPLAIN
+_last_explained: Dict[str, float] = {}
+# monotonic times of the plans captured in the last minute
+_explain_times: Deque[float] = deque()
+_explain_tasks: Set[asyncio.Task] = set()
+_installed = False
+
+
+def _redact(value: Any) -> Any:
+    """Keep the shape and types of the parameters, drop text and binary values."""
+    if value is None or isinstance(value, _PLAIN_TYPES):
+        return value
+    if isinstance(value, str):
+        return f"<str len={len(value)}>"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<bytes len={len(value)}>"
+    if isinstance(value, dict):
+        return {key: _redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact(item) for item in value]
+    return f"<{type(value).__name__}>"
+
+
+def _call_site() -> str:
+    """
+    The innermost application function (outside src/util) awaiting the query.
+
+    Under the async engine the statement runs in a greenlet spawned by
+    SQLAlchemy; the awaiting coroutines are on the stack of its parent.
+    """
+    current = getcurrent()
+    frame = current.parent.gr_frame if current.parent is not None else None
+    if frame is None:
+        frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(SRC_DIR) and not filename.startswith(_PLUMBING_DIRS):
+            module = os.path.relpath(filename, SRC_DIR)
+            return f"{module}:{frame.f_lineno} {frame.f_code.co_qualname}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def _explain_allowed(statement: str) -> bool:
+    if not config.slow_query_explain or not _EXPLAINABLE.match(statement) or _LOCKING.search(statement):
+        return False
+    now = time.monotonic()
+    last = _last_explained.get(statement)
+    if last is not None and now - last < config.slow_query_explain_interval:
+        return False
+    # global budget over a sliding minute
+    while _explain_times and now - _explain_times[0] > 60:
+        _explain_times.popleft()
+    if len(_explain_times) >= config.slow_query_explain_per_minute:
+        return False
+    _explain_times.append(now)
+    _last_explained[statement] = now
+    return True
+
+
+async def _explain(statement: str, parameters: Any, request_id: str):
+    _explaining.set(True)
+    # the plan is logged under the id of the request that ran the statement
+    request_id_var.set(request_id)
+    if isinstance(parameters, list):
+        parameters = tuple(parameters)
+    try:
+        async with read_engine.connect() as conn:
+            # never commits: ANALYZE really executes the statement
+            await conn.exec_driver_sql(
+                f"SET LOCAL statement_timeout = {int(config.slow_query_explain_timeout_ms)}"
+            )
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters
+            )
+            plan = "\n".join(row[0] for row in result)
+            await conn.rollback()
+        logger.warning(f"Plan for slow query:\n{statement}\n{plan}")
+    except Exception as e:
+        logger.error(f"EXPLAIN failed for slow query: {e}")
+
+
+def _observe(statement: str, parameters: Any, started_ns: int, ended_ns: int):
+    threshold = config.slow_query_threshold_ms
+    elapsed_ms = (ended_ns - started_ns) / 1e6
+    if threshold is None or elapsed_ms < threshold or _explaining.get():
+        return
+    logger.warning(
+        "%.1fms at %s\n%s\nparams: %r",
+        elapsed_ms, _call_site(), statement, _redact(parameters),
+    )
+    if not _explain_allowed(statement):
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    # a fresh context: the plan must not count towards the request's trace
+    # or query budget
+    task = loop.create_task(
+        _explain(statement, parameters, request_id_var.get()), context=contextvars.Context()
+    )
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+def install_slow_query_log():
+    """Start reporting slow statements if config.slow_query_threshold_ms is set."""
+    global _installed
+    if config.slow_query_threshold_ms is None or _installed:
+        return
+    add_query_observer(_observe)
+    _installed = True
+    logger.info(f"Slow query log enabled, threshold {config.slow_query_threshold_ms}ms")
@@ -0,0 +1,238 @@
+"""
+Per-request tracing.
+
+TracingMiddleware gives every HTTP request an id, used in the logs and sent
+back in X-Request-ID. With config.tracing_enabled it also opens a RequestTrace
+and keeps it in a contextvar. Instrumented code (database queries in db.py,
+Redis commands in redis_client.py, password hashing, response serialisation)
+records timed spans into it under a category. When the response ends, the
+spans are written to logs/<config.trace_export_file> as OTLP/JSON lines (the
+format of the OpenTelemetry collector's file exporter). The per-category
+totals are only sent to the client, in a Server-Timing header, when
+config.server_timing_enabled is set as well.
+"""
+import json
+import logging
+import re
+import secrets
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.util.config import config
+from src.util.log import request_id_var, setup_logger
+
+logger = setup_logger(__name__, "tracing.log")
+_exporter = setup_logger(
+    "trace-export",
+    config.trace_export_file,
+    level=logging.INFO,
+    console_logging=False,
+    file_format="%(message)s",
+)
+_exporter.propagate = False
+
+# spans kept per request, later ones only count towards the totals
+MAX_SPANS = 500
+REQUEST_ID_HEADER = "x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# categories reported in Server-Timing, in this order
+TIMING_CATEGORIES = ("db", "cache", "hash", "serialize")
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+_CLIENT_CATEGORIES = {"db", "cache"}
+
+
+class Span:
+    __slots__ = ("category", "name", "span_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, category: str, name: str, start_ns: int, end_ns: int, attributes: Dict[str, Any]):
+        self.category = category
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.attributes = attributes
+
+
+class RequestTrace:
+    """Spans and per-category totals of one request."""
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.trace_id = secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.method = method
+        self.path = path
+        self.start_ns = time.time_ns()
+        self.spans: List[Span] = []
+        # category -> [count, total duration in ns]
+        self.totals: Dict[str, List[int]] = {}
+
+    def add(self, category: str, name: str, start_ns: int, end_ns: int, attributes: Dict[str, Any]):
+        total = self.totals.setdefault(category, [0, 0])
+        total[0] += 1
+        total[1] += end_ns - start_ns
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(Span(category, name, start_ns, end_ns, attributes))
+
+    def server_timing(self) -> str:
+        entries = []
+        for category in TIMING_CATEGORIES:
+            if category in self.totals:
+                count, duration = self.totals[category]
+                entries.append(f'{category};dur={duration / 1e6:.2f};desc="{count} calls"')
+        entries.append(f"app;dur={(time.time_ns() - self.start_ns) / 1e6:.2f}")
+        return ", ".join(entries)
+
+    def to_otlp(self, status_code: Optional[int], end_ns: int) -> dict:
+        root = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": f"{self.method} {self.path}",
+            "kind": SPAN_KIND_SERVER,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": _otlp_attributes({
+                "http.request.method": self.method,
+                "url.path": self.path,
+                "http.response.status_code": status_code,
+                "request.id": self.request_id,
+                "spans.dropped": max(0, sum(count for count, _ in self.totals.values()) - len(self.spans)),
+            }),
+            "status": {"code": 2 if status_code is not None and status_code >= 500 else 0},
+        }
+        children = [
+            {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": self.span_id,
+                "name": span.name,
+                "kind": SPAN_KIND_CLIENT if span.category in _CLIENT_CATEGORIES else SPAN_KIND_INTERNAL,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": _otlp_attributes({"category": span.category, **span.attributes}),
+            }
+            for span in self.spans
+        ]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": config.trace_service_name})},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [root, *children]}],
+            }]
+        }
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class _OtlpLine:
+    """Serialised on the logging thread, not the event loop."""
+
+    __slots__ = ("trace", "status_code", "end_ns")
+
+    def __init__(self, trace: RequestTrace, status_code: Optional[int], end_ns: int):
+        self.trace = trace
+        self.status_code = status_code
+        self.end_ns = end_ns
+
+    def __str__(self) -> str:
+        return json.dumps(self.trace.to_otlp(self.status_code, self.end_ns), separators=(",", ":"))
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def record_span(category: str, name: str, start_ns: int, end_ns: int, **attributes):
+    """Add a finished span to the current request's trace (no-op outside a request)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(category, name, start_ns, end_ns, attributes)
+
+
+@contextmanager
+def span(category: str, name: str, **attributes) -> Iterator[None]:
+    """Time the enclosed block as a span of the current request."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.time_ns()
+    try:
+        yield
+    finally:
+        trace.add(category, name, started, time.time_ns(), attributes)
+
+
+def record_query(statement: str, parameters: Any, started_ns: int, ended_ns: int):
+    """Query observer for src.util.db, one span per statement."""
+    record_span("db", "db.query", started_ns, ended_ns, **{"db.statement": statement[:500]})
+
+
+class TracingMiddleware:
+    """ASGI middleware that traces each HTTP request, see the module docstring."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        trace = RequestTrace(request_id, scope["method"], scope["path"]) if config.tracing_enabled else None
+        trace_token = _current_trace.set(trace)
+        request_id_token = request_id_var.set(request_id)
+        status_code: Optional[int] = None
+
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", ()))
+                if trace is not None and config.server_timing_enabled:
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if trace is not None:
+                end_ns = time.time_ns()
+                _exporter.info("%s", _OtlpLine(trace, status_code, end_ns))
+                logger.debug(
+                    "%s %s -> %s in %.2fms",
+                    trace.method, trace.path, status_code, (end_ns - trace.start_ns) / 1e6,
+                )
+            _current_trace.reset(trace_token)
+            request_id_var.reset(request_id_token)
@@ -1,27 +1,38 @@
 from typing import List
 from fastapi import Depends
-from src.v1.model.user import User
-from src.v1.controllers.util import get_current_user
+from src.v1.auth.service import AccessTokenBearer
+from src.v1.controllers.util import get_user_service
+from src.v1.service.user import UserService
 from src.util.exception import AuthorizationError
 from src.util.log import setup_logger
 
 logger = setup_logger(__name__, "authorization.log")
 
 class RoleCheck():
+    """
+    Role gate decided from the verified access token alone, no database
+    access. The role claim is set at login, so a role change takes effect
+    when the user's token is next issued; use FreshRoleCheck where that lag
+    is not acceptable.
+    """
     def __init__(self, required_roles = List[str]):
         self.required_roles = required_roles
     
-    def __call__(self, current_user: "User" = Depends(get_current_user)):
-        logger.info(f"Role check for user {current_user.id} with roles {current_user.role} against required roles {self.required_roles}")
-        user_roles_list = [current_user.role] if isinstance(current_user.role, str) else current_user.role
+    async def __call__(self, token_details: dict = Depends(AccessTokenBearer())):
+        user = token_details["user"]
+        return self.check(user["user_id"], user["role"])
+
+    def check(self, user_id, role):
+        logger.debug("Role check for user %s with roles %s against required roles %s", user_id, role, self.required_roles)
+        user_roles_list = [role] if isinstance(role, str) else role
         
         
         access = self.has_access(self.required_roles, user_roles_list)
         if access:
-            logger.info(f"Access granted for user {current_user.id}")
+            logger.debug("Access granted for user %s", user_id)
             return True
         else:
-            logger.warning(f"Access denied for user {current_user.id}: required roles {self.required_roles}, user roles {current_user.role}")
+            logger.warning(f"Access denied for user {user_id}: required roles {self.required_roles}, user roles {role}")
             raise AuthorizationError()
     
 # In your has_access method:
@@ -33,4 +44,20 @@ class RoleCheck():
         if isinstance(required_roles, str):
             required_roles = [required_roles]
             
-        return bool (set(user_role) & set(required_roles))
\ No newline at end of file
+        return bool (set(user_role) & set(required_roles))
+
+
+class FreshRoleCheck(RoleCheck):
+    """RoleCheck against the user's current role in the database, for sensitive operations."""
+
+    async def __call__(
+        self,
+        token_details: dict = Depends(AccessTokenBearer()),
+        user_service: UserService = Depends(get_user_service),
+    ):
+        user_id = token_details["user"]["user_id"]
+        role = await user_service.fetch_user_role(user_id)
+        if role is None:
+            logger.warning(f"Access denied for user {user_id}: user no longer exists")
+            raise AuthorizationError()
+        return self.check(user_id, role)
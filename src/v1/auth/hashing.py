@@ -0,0 +1,26 @@
+"""
+Batch password hashing run in the worker processes of the bulk-import pool.
+
+Spawned workers import this module on its own, so it depends on passlib only:
+the parent sends its CryptContext settings (CryptContext.to_dict()) with each
+batch instead of the worker loading the app config to build them.
+"""
+from typing import Dict, List
+
+from passlib.context import CryptContext
+
+# settings -> context, built once per worker process
+_contexts: Dict[str, CryptContext] = {}
+
+
+def _context(settings: dict) -> CryptContext:
+    key = repr(sorted(settings.items()))
+    context = _contexts.get(key)
+    if context is None:
+        context = _contexts[key] = CryptContext(**settings)
+    return context
+
+
+def hash_many(settings: dict, passwords: List[str]) -> List[str]:
+    context = _context(settings)
+    return [context.hash(password) for password in passwords]
@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import math
+import time
+from typing import Dict, Optional
+
+from src.util.config import config
+from src.util.local_cache import LocalCache
+from src.util.log import setup_logger
+from src.util.redis_client import get_redis, get_stream_redis
+
+logger = setup_logger(__name__, "auth_service.log")
+
+# seconds to wait before re-reading the stream after the connection drops
+RESUBSCRIBE_DELAY = 5
+REBUILD_BATCH_SIZE = 1000
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter: `in` is never wrong about an item that was
+    added, and wrong about one that was not with probability ~`error_rate`
+    while fewer than `capacity` items have been added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationStore:
+    """
+    Denylist of revoked token ids (jti).
+
+    Each revocation is a `revoked:<jti>` key that expires with the token, plus
+    an entry on STREAM. Every worker keeps a Bloom filter of the jtis on the
+    stream, rebuilt at startup and kept current by tailing the stream, so the
+    common "not revoked" answer needs no network call. Possible hits, and
+    every lookup while the filter may be behind the stream (listener down,
+    rebuilding, or more live revocations than the filter holds), are checked
+    against Redis.
+    """
+
+    PREFIX = "revoked:"
+    STREAM = "auth:revocations"
+
+    def __init__(self):
+        self._bloom = self._new_bloom()
+        # jtis confirmed revoked, so a replayed token does not hit redis either
+        self._revoked = LocalCache("revoked", config.revocation_local_max_entries, config.refresh_token_expiry)
+        self._healthy = False
+        self._last_id = "0-0"
+        self._listener: Optional[asyncio.Task] = None
+        self.local_answers = 0
+        self.redis_lookups = 0
+
+    @staticmethod
+    def _new_bloom() -> BloomFilter:
+        return BloomFilter(config.revocation_bloom_capacity, config.revocation_bloom_error_rate)
+
+    def key(self, jti: str) -> str:
+        return f"{self.PREFIX}{jti}"
+
+    @staticmethod
+    def _oldest_live_id() -> str:
+        # no token lives longer than this, older stream entries are dead
+        lifetime = max(config.access_token_expiry, config.refresh_token_expiry)
+        return f"{int((time.time() - lifetime) * 1000)}-0"
+
+    async def revoke(self, jti: str, exp: float):
+        """
+        Revoke a token until its expiry.
+
+        Args:
+            jti: token id
+            exp: the token's `exp` claim (unix timestamp)
+        """
+        ttl = max(1, math.ceil(exp - time.time()))
+        redis_conn = await get_redis()
+        async with redis_conn.pipeline(transaction=False) as pipe:
+            pipe.set(self.key(jti), 1, ex=ttl)
+            pipe.xadd(
+                self.STREAM,
+                {"jti": jti, "exp": int(exp)},
+                minid=self._oldest_live_id(),
+                approximate=True,
+            )
+            await pipe.execute()
+        self._bloom.add(jti)
+        self._revoked.set(jti, True, ttl)
+        logger.info(f"Revoked token {jti} for {ttl}s")
+
+    async def is_revoked(self, jti: str) -> bool:
+        if self._revoked.get(jti):
+            return True
+        if self._healthy and jti not in self._bloom:
+            self.local_answers += 1
+            return False
+        self.redis_lookups += 1
+        redis_conn = await get_redis()
+        revoked = bool(await redis_conn.exists(self.key(jti)))
+        if revoked:
+            self._revoked.set(jti, True)
+        return revoked
+
+    async def _rebuild(self, redis_conn):
+        """Fill a fresh Bloom filter from every live entry on the stream."""
+        bloom = self._new_bloom()
+        now = time.time()
+        start = self._oldest_live_id()
+        last_id = start
+        while True:
+            entries = await redis_conn.xrange(self.STREAM, min=start, count=REBUILD_BATCH_SIZE)
+            for entry_id, fields in entries:
+                last_id = entry_id
+                if float(fields[b"exp"]) > now:
+                    bloom.add(fields[b"jti"].decode())
+            if len(entries) < REBUILD_BATCH_SIZE:
+                break
+            start = b"(" + last_id
+        self._bloom = bloom
+        self._last_id = last_id
+        logger.info(f"Loaded {bloom.count} revoked tokens into the bloom filter.")
+
+    async def _listen(self):
+        rebuild_delay = RESUBSCRIBE_DELAY
+        while True:
+            try:
+                redis_conn = await get_stream_redis()
+                # lookups go to redis until the filter has caught up
+                self._healthy = False
+                await self._rebuild(redis_conn)
+                if self._bloom.count >= self._bloom.capacity:
+                    # more live revocations than the filter holds, rebuilding
+                    # again only helps once some of them expire
+                    logger.warning(
+                        f"{self._bloom.count} live revoked tokens exceed revocation_bloom_capacity "
+                        f"({self._bloom.capacity}), checking every token against redis for {rebuild_delay}s"
+                    )
+                    await asyncio.sleep(rebuild_delay)
+                    rebuild_delay = min(rebuild_delay * 2, config.revocation_rebuild_max_delay)
+                    continue
+                rebuild_delay = RESUBSCRIBE_DELAY
+                self._healthy = True
+                while self._bloom.count < self._bloom.capacity:
+                    # a dead connection surfaces as a socket timeout instead
+                    # of a read that never returns
+                    response = await redis_conn.xread(
+                        {self.STREAM: self._last_id}, block=config.redis_stream_block_ms
+                    )
+                    for _, entries in response or ():
+                        for entry_id, fields in entries:
+                            self._last_id = entry_id
+                            self._bloom.add(fields[b"jti"].decode())
+                # full: rebuild, which drops the tokens that have expired since
+            except asyncio.CancelledError:
+                self._healthy = False
+                raise
+            except Exception as e:
+                self._healthy = False
+                logger.error(f"Revocation stream listener failed, retrying: {e}")
+                await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+    def stats(self) -> Dict[str, int | bool]:
+        return {
+            "healthy": self._healthy,
+            "bloom_entries": self._bloom.count,
+            "local_answers": self.local_answers,
+            "redis_lookups": self.redis_lookups,
+        }
+
+    async def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+            self._healthy = False
+
+
+revocation_store = RevocationStore()
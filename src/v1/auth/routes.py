@@ -1,15 +1,18 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, status
-from src.v1.schema.user import CreateUser, UserResponse, CreateStudent
+from fastapi import APIRouter, Depends, Request, status
+from src.v1.schema.user import BulkUserRow, CreateUser, UserResponse, CreateStudent
 from src.v1.service.user import UserService
 from src.v1.model.user import Role_Enum
 from src.util.response import success_response
+from src.util.query_budget import query_budget
+from src.util.bulk import build_import_report, read_import_rows, validate_import_rows
 from src.v1.controllers.util import get_user_service, get_current_user
 from .schema import Login
+from .revocation import revocation_store
+from .throttle import login_throttle
 from .service import auth_service, RefreshTokenBearer, AccessTokenBearer
 from src.util.config import config
-from src.util.redis_client import key_exist, set_cache
-from src.v1.auth.authorization import RoleCheck
+from src.v1.auth.authorization import FreshRoleCheck, RoleCheck
 
 auth_router = APIRouter(prefix="/auth")
 
@@ -42,12 +45,38 @@ user_service:UserService = Depends(get_user_service)
     )
 
 
+@auth_router.post("/bulk-register")
+async def bulk_register(request: Request,
+user_service:UserService = Depends(get_user_service),
+role = Depends(FreshRoleCheck([Role_Enum.ADMIN]))
+):
+    """
+    Register many students/lecturers at once from a JSON array, a text/csv
+    body or a multipart CSV upload. Every row gets a created/error entry.
+    Admins only.
+    """
+    rows = await read_import_rows(request)
+    valid, errors = validate_import_rows(rows, BulkUserRow)
+    results = errors + await user_service.bulk_create_users(valid)
+    report = build_import_report(results)
+    return success_response(
+        message="Bulk Registration Processed",
+        status_code=status.HTTP_200_OK,
+        data=report.model_dump()
+    )
+
+
 @auth_router.post("/login")
+@query_budget(4)
 async def login(user_data: Login,
+request: Request,
 user_service:UserService = Depends(get_user_service)                   
 ):
     # tokens = []
+    # before any lookup or hashing, guessing passwords must not cost us CPU
+    await login_throttle.check(user_data, request.client.host if request.client else None)
     user = await user_service.authenticate_user(user_data)
+    await login_throttle.reset(user_data)
     access_token = auth_service.create_access_token(user)
     
     refresh_token = auth_service.create_access_token(
@@ -91,10 +120,11 @@ async def get_new_access_token(token_details:dict = Depends(RefreshTokenBearer()
         
 
 @auth_router.get("/me")
+@query_budget(4)
 async def current_user(user = Depends(get_current_user),
             role = Depends(RoleCheck([Role_Enum.LECTURER]))
             ):
-    validated_data = UserResponse.model_validate(user).model_dump()
+    validated_data = user.model_dump(exclude={"course_ids"})
     return success_response(
         message="User Fetched Successfully",
         status_code=status.HTTP_200_OK,
@@ -103,11 +133,7 @@ async def current_user(user = Depends(get_current_user),
 
 @auth_router.get("/logout")
 async def revoke_token(token_details:dict = Depends(AccessTokenBearer())):
-    jti = token_details["jti"]
-    await set_cache(
-        key= str(jti),
-        data=""
-    )
+    await revocation_store.revoke(str(token_details["jti"]), token_details["exp"])
     return success_response(
         message="Logged Out Successfully",
         status_code=status.HTTP_200_OK,
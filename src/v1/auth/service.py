@@ -1,20 +1,49 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
 import uuid
 from passlib.context import CryptContext
+from passlib.hash import argon2
 from fastapi import Depends, Request
 import jwt
 from src.util.config import config
 from src.v1.base.exception import TokenExpired
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from src.v1.base.exception import InvalidToken
+from src.util.local_cache import LocalCache
 from src.util.log import setup_logger
+from src.util.tracing import record_span
+from .hashing import hash_many
 from .schema import Token
-from src.util.redis_client import key_exist, set_cache
+from .revocation import revocation_store
 logger = setup_logger(__name__, "auth_service.log")
 
-ctx = CryptContext(
-    schemes=["bcrypt"]
-)
+def _build_crypt_context() -> CryptContext:
+    scheme = config.password_hash_scheme
+    if scheme == "argon2" and not argon2.has_backend():
+        logger.warning("argon2 requested but argon2-cffi is not installed, hashing with bcrypt")
+        scheme = "bcrypt"
+    # every scheme but the default is deprecated, so verify_and_update
+    # migrates old hashes (and bcrypt hashes below the configured rounds)
+    return CryptContext(
+        schemes=["argon2", "bcrypt"],
+        default=scheme,
+        deprecated="auto",
+        bcrypt__rounds=config.password_bcrypt_rounds,
+        bcrypt__min_rounds=config.password_bcrypt_rounds,
+        argon2__type="ID",
+        argon2__rounds=config.password_argon2_time_cost,
+        argon2__memory_cost=config.password_argon2_memory_cost,
+        argon2__parallelism=config.password_argon2_parallelism,
+    )
+
+
+ctx = _build_crypt_context()
 
 def password_hash(password:str)->str:
     hash = ctx.hash(password)
@@ -25,6 +54,145 @@ def verify_password(password, password_hash):
     is_valid = ctx.verify(password, password_hash)
     return is_valid 
 
+
+# Hashing takes hundreds of milliseconds of CPU, so request handlers run it
+# on a small thread pool (bcrypt and argon2 release the GIL). The semaphore
+# caps hashes in flight; callers beyond it queue here rather than in the
+# executor, which makes queue time and depth observable.
+_hash_threads = ThreadPoolExecutor(
+    max_workers=config.password_hash_concurrency, thread_name_prefix="password-hash"
+)
+_hash_slots = asyncio.Semaphore(config.password_hash_concurrency)
+_hash_stats: Dict[str, float] = {
+    "queued": 0,
+    "running": 0,
+    "completed": 0,
+    "queue_time_total": 0.0,
+    "queue_time_max": 0.0,
+    "run_time_total": 0.0,
+}
+
+T = TypeVar("T")
+
+
+async def _run_hash_job(fn: Callable[..., T], *args) -> T:
+    enqueued_ns = time.time_ns()
+    enqueued = time.monotonic()
+    _hash_stats["queued"] += 1
+    try:
+        await _hash_slots.acquire()
+    finally:
+        _hash_stats["queued"] -= 1
+    started = time.monotonic()
+    waited = started - enqueued
+    _hash_stats["queue_time_total"] += waited
+    _hash_stats["queue_time_max"] = max(_hash_stats["queue_time_max"], waited)
+    _hash_stats["running"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_threads, fn, *args)
+    finally:
+        _hash_stats["running"] -= 1
+        _hash_stats["completed"] += 1
+        _hash_stats["run_time_total"] += time.monotonic() - started
+        _hash_slots.release()
+        record_span("hash", f"password.{fn.__name__}", enqueued_ns, time.time_ns(), queue_ms=round(waited * 1000, 2))
+
+
+async def hash_password(password: str) -> str:
+    """Hash `password` with the configured scheme without blocking the event loop."""
+    return await _run_hash_job(ctx.hash, password)
+
+
+async def verify_and_update_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check `password` against `hashed` without blocking the event loop.
+
+    Returns:
+        Tuple[bool, Optional[str]]: whether it matches, and a replacement hash
+        when `hashed` uses a deprecated scheme or weaker parameters
+    """
+    return await _run_hash_job(ctx.verify_and_update, password, hashed)
+
+
+def hash_stats() -> Dict[str, float]:
+    completed = _hash_stats["completed"]
+    return {
+        **_hash_stats,
+        "concurrency": config.password_hash_concurrency,
+        "queue_time_avg": round(_hash_stats["queue_time_total"] / completed, 4) if completed else 0.0,
+        "run_time_avg": round(_hash_stats["run_time_total"] / completed, 4) if completed else 0.0,
+    }
+
+
+# process pool for hashing whole batches (bulk imports), started with the app
+_hash_pool: Optional[ProcessPoolExecutor] = None
+HASH_CHUNK_SIZE = 32
+
+
+def _hash_pool_size() -> int:
+    """
+    Processes per worker: config.password_hash_processes, or this worker's
+    share of the CPUs when unset, so web_concurrency workers together start
+    about one process per CPU.
+    """
+    if config.password_hash_processes:
+        return config.password_hash_processes
+    return max(1, (os.cpu_count() or 1) // max(1, config.web_concurrency))
+
+
+def start_hash_pool():
+    """
+    Create the batch hashing process pool. Workers are spawned, not forked:
+    by now this process runs the logging, Redis and database threads, and a
+    forked child could inherit one of their locks held and deadlock. They
+    only import src.v1.auth.hashing, not the app.
+    """
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=_hash_pool_size(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash a batch of passwords in parallel worker processes, keeping the event
+    loop free. Results are returned in the same order as `passwords`.
+    """
+    if not passwords:
+        return []
+    if _hash_pool is None:
+        # outside the app (scripts), start it on first use
+        start_hash_pool()
+    loop = asyncio.get_running_loop()
+    chunks = [
+        passwords[i : i + HASH_CHUNK_SIZE]
+        for i in range(0, len(passwords), HASH_CHUNK_SIZE)
+    ]
+    settings = ctx.to_dict()
+    hashed = await asyncio.gather(
+        *(loop.run_in_executor(_hash_pool, hash_many, settings, chunk) for chunk in chunks)
+    )
+    return [password for chunk in hashed for password in chunk]
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    _hash_threads.shutdown(wait=False, cancel_futures=True)
+    if _hash_pool is not None:
+        _hash_pool.shutdown(cancel_futures=True)
+        _hash_pool = None
+
+# sha256(token) -> verified claims of an access token, until the token expires.
+# Claims are shared between requests, treat them as read-only.
+_claims_cache = LocalCache("claims", config.claims_cache_max_entries, config.access_token_expiry)
+
+
+def claims_cache_stats() -> dict:
+    return _claims_cache.stats()
+
+
 class AuthService():
     """this class handles in-app authentication (jwt access token, refresh token)
     """
@@ -59,13 +227,22 @@ class AuthService():
             raise
     
     def decode_token(self, token:str)-> dict:
+        # the same access token is presented on every request of a session,
+        # verify it once and serve the claims from memory until it expires
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        token_data = _claims_cache.get(cache_key)
+        if token_data is not None and token_data["exp"] > time.time():
+            return token_data
         try:
             token_data = jwt.decode(
                 jwt=token,
                 key=config.jwt_secret_key,
                 algorithms=[config.jwt_algo]
             )
-            logger.info(f"token decoded successfully for user: {token_data.get('user').get('id')}")
+            logger.debug("token decoded successfully for user: %s", token_data.get('user').get('id'))
+            # refresh tokens are rare and long lived, never cache them
+            if not token_data.get("refresh", False):
+                _claims_cache.set(cache_key, token_data, token_data["exp"] - time.time())
             return token_data
         except jwt.ExpiredSignatureError as e:
             logger.error(f"token expired for user: {e}", exc_info=True)
@@ -138,7 +315,7 @@ class TokenService(HTTPBearer):
             raise InvalidToken("No data found in token")
 
         #check if token in block list 
-        if await key_exist(key=token_data["jti"]):
+        if await revocation_store.is_revoked(token_data["jti"]):
             raise InvalidToken("Token has been revoked, get new token") 
         # Allow child to validate token type (access or refresh)
         self.verify_token_type(token_data)
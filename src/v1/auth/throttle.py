@@ -0,0 +1,121 @@
+import uuid
+from typing import Dict, Optional
+
+from src.util.config import config
+from src.util.log import setup_logger
+from src.util.redis_client import get_redis
+from src.v1.auth.schema import Login
+from src.v1.base.exception import TooManyRequests
+
+logger = setup_logger(__name__, "auth_service.log")
+
+# Sliding window over a sorted set of attempt timestamps per bucket. Every
+# bucket is trimmed to the window first; if any is full nothing is recorded
+# and the milliseconds until its oldest counted attempt leaves the window are
+# returned with the bucket's index, otherwise the attempt is added to all.
+_SLIDING_WINDOW_SCRIPT = """
+local now_parts = redis.call("TIME")
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local window = tonumber(ARGV[1])
+local member = ARGV[2]
+local retry_ms, blocked = 0, 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 + i])
+    redis.call("ZREMRANGEBYSCORE", key, "-inf", now - window)
+    local count = redis.call("ZCARD", key)
+    if count >= limit then
+        local oldest = redis.call("ZRANGE", key, count - limit, count - limit, "WITHSCORES")
+        local wait = tonumber(oldest[2]) + window - now
+        if wait > retry_ms then
+            retry_ms, blocked = wait, i
+        end
+    end
+end
+if blocked > 0 then
+    return {retry_ms, blocked}
+end
+for _, key in ipairs(KEYS) do
+    redis.call("ZADD", key, now, member)
+    redis.call("PEXPIRE", key, window)
+end
+return {0, 0}
+"""
+
+
+class LoginThrottle:
+    """
+    Limits login attempts per account identifier (email or school_id) and per
+    client IP, so credential guessing cannot keep the workers busy hashing.
+
+    Checked before any lookup or password verification. Every attempt counts
+    against both buckets; a successful login clears the identifier's bucket.
+    If Redis is unavailable logins are let through.
+    """
+
+    PREFIX = "throttle:login:"
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {
+            "allowed": 0,
+            "blocked_identifier": 0,
+            "blocked_ip": 0,
+            "errors": 0,
+        }
+
+    def _identifier_key(self, user_data: Login) -> str:
+        identifier = user_data.email or user_data.school_id
+        return f"{self.PREFIX}id:{identifier.strip().casefold()}"
+
+    def _ip_key(self, client_ip: str) -> str:
+        return f"{self.PREFIX}ip:{client_ip}"
+
+    async def check(self, user_data: Login, client_ip: Optional[str]):
+        """
+        Record a login attempt.
+
+        Raises:
+            TooManyRequests: if the identifier or the IP used up its attempts,
+                with `retry_after` set to the seconds until one frees up
+        """
+        keys = [self._identifier_key(user_data)]
+        limits = [config.login_max_attempts_per_identifier]
+        if client_ip:
+            keys.append(self._ip_key(client_ip))
+            limits.append(config.login_max_attempts_per_ip)
+        try:
+            redis_conn = await get_redis()
+            retry_ms, blocked = await redis_conn.eval(
+                _SLIDING_WINDOW_SCRIPT,
+                len(keys),
+                *keys,
+                config.login_window_seconds * 1000,
+                uuid.uuid4().hex,
+                *limits,
+            )
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.error(f"Login throttle unavailable, allowing attempt: {e}")
+            return
+        if not blocked:
+            self.counters["allowed"] += 1
+            return
+
+        bucket = "identifier" if blocked == 1 else "ip"
+        self.counters[f"blocked_{bucket}"] += 1
+        retry_after = max(1, -(-int(retry_ms) // 1000))
+        logger.warning(f"Login throttled by {bucket} bucket {keys[blocked - 1]}, retry in {retry_after}s")
+        raise TooManyRequests("Too many login attempts, try again later", retry_after=retry_after)
+
+    async def reset(self, user_data: Login):
+        """Forget the identifier's attempts after it logged in successfully."""
+        try:
+            redis_conn = await get_redis()
+            await redis_conn.unlink(self._identifier_key(user_data))
+        except Exception as e:
+            logger.error(f"Failed to reset login throttle: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+
+login_throttle = LoginThrottle()
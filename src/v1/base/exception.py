@@ -58,3 +58,8 @@ class NotActive(BaseExceptionClass):
 class AuthorizationError(BaseExceptionClass):
     pass
 
+class TooManyRequests(BaseExceptionClass):
+    def __init__(self, message: str | None = None, retry_after: int | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
@@ -1,5 +1,6 @@
 from typing import (
     Any,
+    List,
     Optional,
 )
 from pydantic import BaseModel, ConfigDict
@@ -19,4 +20,23 @@ class SuccessResponse(BaseAPISchema):
     status: str = "success"
 
 
+class PaginatedResponse(SuccessResponse):
+    next_cursor: Optional[str] = None
+    limit: int
+
+
+class BulkRowResult(BaseModel):
+    """Outcome of one row of a bulk import, `row` is its 0-based position in the upload."""
+    row: int
+    status: str  # "created" or "error"
+    id: Optional[Any] = None
+    error: Optional[str] = None
+
+
+class BulkImportReport(BaseModel):
+    created: int
+    failed: int
+    rows: List[BulkRowResult]
+
+
 #constant messages
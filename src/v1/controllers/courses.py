@@ -1,9 +1,15 @@
 import uuid
+from typing import Optional
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Request, status
 
+from src.util.bulk import build_import_report, read_import_rows, validate_import_rows
+from src.util.db import has_recent_write, replica_configured, session_scope
 from src.util.log import setup_logger
-from src.util.response import success_response
+from src.util.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from src.util.query_budget import query_budget
+from src.util.response import cached_response, success_content, success_response
+from src.v1.auth.authorization import FreshRoleCheck
 from src.v1.auth.service import AccessTokenBearer
 from src.v1.schema.courses import (
     CourseResponse,
@@ -11,7 +17,14 @@ from src.v1.schema.courses import (
     DeptResponse,
     LevelResponse,
 )
+from src.v1.model.user import Role_Enum
 from src.v1.schema.user import UserCourse, UserResponse
+from src.v1.service.catalogue import (
+    CATALOGUE_DEPARTMENTS_KEY,
+    CATALOGUE_LEVELS_KEY,
+    dept_courses_key,
+    dept_courses_writer,
+)
 from src.v1.service.courses import CourseService, DeptService, LevelService
 
 from .util import get_course_service, get_dept_service, get_level_service
@@ -31,54 +44,74 @@ courses_router = APIRouter()
 
 
 @courses_router.get("/levels")
-async def fetch_levels(level_service: LevelService = Depends(get_level_service)):
-    levels = await level_service.fetch_all_level()
-    # logger.info(levels)
-    lev = []
-    for level in levels:
-        # logger.info(f"loop: {level}")
-        level_value = LevelResponse.model_validate(level).model_dump()
-        # logger.info(level_value)
-        lev.append(level_value)
-    return success_response(status_code=status.HTTP_200_OK, data=lev)
+@query_budget(2)
+async def fetch_levels(
+    request: Request, level_service: LevelService = Depends(get_level_service)
+):
+    async def build_content():
+        levels = await level_service.fetch_all_level()
+        lev = []
+        for level in levels:
+            level_value = LevelResponse.model_validate(level).model_dump()
+            lev.append(level_value)
+        return success_content(data=lev)
+
+    return await cached_response(request, CATALOGUE_LEVELS_KEY, build_content)
 
 
 @courses_router.get("/departments")
-async def fetch_all_department(dept_service: DeptService = Depends(get_dept_service)):
-    departments = await dept_service.fetch_all_dept()
-    dept = []
+@query_budget(2)
+async def fetch_all_department(
+    request: Request, dept_service: DeptService = Depends(get_dept_service)
+):
+    async def build_content():
+        departments = await dept_service.fetch_all_dept()
+        dept = []
 
-    for department in departments:
-        dept_value = DeptResponse.model_validate(department).model_dump()
-        dept.append(dept_value)
+        for department in departments:
+            dept_value = DeptResponse.model_validate(department).model_dump()
+            dept.append(dept_value)
+        return success_content(data=dept)
 
-    return success_response(status_code=status.HTTP_200_OK, data=dept)
+    return await cached_response(request, CATALOGUE_DEPARTMENTS_KEY, build_content)
 
 
 @courses_router.get("/departments/courses")
+@query_budget(3)
 async def fetch_all_course_in_a_department(
+    request: Request,
     dept_id: uuid.UUID = Query(...),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     dept_service: DeptService = Depends(get_dept_service),
 ):
-    dept = []
-    departments = await dept_service.fetch_all_courses_for_a_dept(dept_id)
-    if not departments:
+    async def build_content():
         dept = []
-
-    for department in departments:
-        # return department.to_dict()
-        dept_value = CourseResponse.model_validate(department).model_dump(
-            exclude={
-                "level": {"created_at", "updated_at"},
-                "department": {"created_at", "updated_at"},
-            }
-        )
-        dept.append(dept_value)
-
-    return success_response(status_code=status.HTTP_200_OK, data=dept)
+        if replica_configured() and await has_recent_write(dept_courses_writer(dept_id)):
+            # the replica may not have the change that retired the old pages
+            # yet, a page cached from it would stay stale for the whole ttl
+            async with session_scope() as session:
+                page = await DeptService(db=session).fetch_all_courses_for_a_dept(dept_id, cursor, limit)
+        else:
+            page = await dept_service.fetch_all_courses_for_a_dept(dept_id, cursor, limit)
+
+        for department in page.items:
+            dept_value = CourseResponse.model_validate(department).model_dump(
+                exclude={
+                    "level": {"created_at", "updated_at"},
+                    "department": {"created_at", "updated_at"},
+                }
+            )
+            dept.append(dept_value)
+        return success_content(data=dept, page=page)
+
+    return await cached_response(
+        request, await dept_courses_key(dept_id, cursor, limit), build_content
+    )
 
 
 @courses_router.post("/course")
+@query_budget(2)
 async def create_course(
     course_data: CreateCourse,
     course_service: CourseService = Depends(get_course_service),
@@ -94,10 +127,27 @@ async def create_course(
     return success_response(status_code=status.HTTP_201_CREATED, data=course)
 
 
+@courses_router.post("/course/import")
+async def import_courses(
+    request: Request,
+    course_service: CourseService = Depends(get_course_service),
+    role=Depends(FreshRoleCheck([Role_Enum.ADMIN])),
+):
+    """Create a catalogue of courses from a JSON array or CSV, reporting conflicts per row. Admins only."""
+    rows = await read_import_rows(request)
+    valid, errors = validate_import_rows(rows, CreateCourse)
+    results = errors + await course_service.bulk_create_courses(valid)
+    report = build_import_report(results)
+    return success_response(status_code=status.HTTP_200_OK, data=report.model_dump())
+
+
 @courses_router.get("/course/student/{course_id}")
+@query_budget(6)
 async def fetch_all_student_taking_course(
     # request: Request,
     course_id: uuid.UUID,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     course_service: CourseService = Depends(get_course_service),
     token_details: dict = Depends(AccessTokenBearer()),
 ):
@@ -106,20 +156,25 @@ async def fetch_all_student_taking_course(
         {"user_id": user_id, "course_id": course_id}
     )
     logger.debug(f"request body: {validated_data.course_id}, {validated_data.user_id}")
-    students = await course_service.fetch_all_student_taking_course(validated_data)
+    page = await course_service.fetch_all_student_taking_course(
+        validated_data, cursor, limit
+    )
     user_list = []
-    for student in students:
+    for student in page.items:
         # logger.info(f"loop: {level}")
         user_value = UserResponse.model_validate(student).model_dump(exclude="password")
         # logger.info(level_value)
         user_list.append(user_value)
-    return success_response(status_code=status.HTTP_200_OK, data=user_list)
+    return success_response(status_code=status.HTTP_200_OK, data=user_list, page=page)
 
 
 @courses_router.get("/course/lecturers/{course_id}")
+@query_budget(6)
 async def fetch_all_lecturers_taking_course(
     # request: Request,
     course_id: uuid.UUID,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     course_service: CourseService = Depends(get_course_service),
     token_details: dict = Depends(AccessTokenBearer()),
 ):
@@ -128,11 +183,13 @@ async def fetch_all_lecturers_taking_course(
         {"user_id": user_id, "course_id": course_id}
     )
     logger.debug(f"request body: {validated_data.course_id}, {validated_data.user_id}")
-    lecturers = await course_service.fetch_all_lecturers_taking_course(validated_data)
+    page = await course_service.fetch_all_lecturers_taking_course(
+        validated_data, cursor, limit
+    )
     user_list = []
-    for lecturer in lecturers:
+    for lecturer in page.items:
         # logger.info(f"loop: {level}")
         user_value = UserResponse.model_validate(lecturer).model_dump(exclude="password")
         # logger.info(level_value)
         user_list.append(user_value)
-    return success_response(status_code=status.HTTP_200_OK, data=user_list)
+    return success_response(status_code=status.HTTP_200_OK, data=user_list, page=page)
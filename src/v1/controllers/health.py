@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, status
+
+from src.util.db import pool_stats
+from src.util.redis_client import cache_stats, redis_pool_stats
+from src.util.response import success_response
+from src.v1.auth.authorization import RoleCheck
+from src.v1.auth.revocation import revocation_store
+from src.v1.auth.service import claims_cache_stats, hash_stats
+from src.v1.auth.throttle import login_throttle
+from src.v1.model.user import Role_Enum
+
+health_router = APIRouter(prefix="/health")
+
+# the detailed endpoints expose pool sizes, hit rates and auth internals
+admin_only = [Depends(RoleCheck([Role_Enum.ADMIN]))]
+
+
+@health_router.get("")
+async def liveness():
+    """Unauthenticated liveness probe, answers as long as the worker serves requests."""
+    return success_response(status_code=status.HTTP_200_OK, data={"status": "ok"})
+
+
+@health_router.get("/db", dependencies=admin_only)
+async def db_pool_stats():
+    """Connection pool sizes and checkout/wait/overflow counters for each engine."""
+    return success_response(status_code=status.HTTP_200_OK, data=pool_stats())
+
+
+@health_router.get("/cache", dependencies=admin_only)
+async def cache_hit_stats():
+    """Per-namespace in-process (L1) and Redis (L2) hit/miss counters for this worker."""
+    return success_response(status_code=status.HTTP_200_OK, data=cache_stats())
+
+
+@health_router.get("/redis", dependencies=admin_only)
+async def redis_connection_stats():
+    """Redis connection pool usage for this worker."""
+    return success_response(status_code=status.HTTP_200_OK, data=redis_pool_stats())
+
+
+@health_router.get("/auth", dependencies=admin_only)
+async def auth_stats():
+    """Claims cache, revoked-token filter, password hashing queue and login throttle counters for this worker."""
+    return success_response(
+        status_code=status.HTTP_200_OK,
+        data={
+            "claims_cache": claims_cache_stats(),
+            "revocations": revocation_store.stats(),
+            "password_hashing": hash_stats(),
+            "login_throttle": login_throttle.stats(),
+        },
+    )
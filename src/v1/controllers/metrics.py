@@ -0,0 +1,69 @@
+import asyncio
+from typing import List
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from src.util.db import pool_stats
+from src.util.metrics import CONTENT_TYPE, register_collector, render_metrics, snapshot
+from src.util.redis_client import cache_stats, redis_pool_stats
+from src.v1.auth.service import hash_stats
+
+metrics_router = APIRouter()
+
+
+def _collect_db_pools() -> List[dict]:
+    pools = pool_stats()
+
+    def samples(field, scale=1.0):
+        return [({"engine": name}, data[field] * scale) for name, data in pools.items() if field in data]
+
+    return [
+        {"name": "db_pool_checkouts_total", "type": "counter", "help": "Connections checked out of the pool.", "samples": samples("checkouts")},
+        {"name": "db_pool_waits_total", "type": "counter", "help": "Checkouts that found the pool exhausted and waited for a connection to be returned.", "samples": samples("waits")},
+        {"name": "db_pool_wait_seconds_total", "type": "counter", "help": "Time checkouts spent waiting on an exhausted pool.", "samples": samples("wait_total_ms", 0.001)},
+        {"name": "db_pool_timeouts_total", "type": "counter", "help": "Checkouts that gave up waiting.", "samples": samples("timeouts")},
+        {"name": "db_pool_checked_out", "type": "gauge", "help": "Connections currently in use.", "samples": samples("checked_out")},
+        {"name": "db_pool_size", "type": "gauge", "help": "Configured pool size.", "samples": samples("size")},
+        {"name": "db_pool_overflow", "type": "gauge", "help": "Connections open beyond the pool size.", "samples": samples("overflow")},
+    ]
+
+
+def _collect_cache() -> List[dict]:
+    hits, misses, ratios = [], [], []
+    for namespace, tiers in cache_stats().items():
+        for tier, counters in tiers.items():
+            labels = {"namespace": namespace, "tier": tier}
+            hits.append((labels, counters["hits"]))
+            misses.append((labels, counters["misses"]))
+            ratios.append((labels, counters["hit_ratio"]))
+    redis_pool = redis_pool_stats()
+    return [
+        {"name": "cache_hits_total", "type": "counter", "help": "Cache hits by key namespace and tier (l1 in-process, l2 Redis).", "samples": hits},
+        {"name": "cache_misses_total", "type": "counter", "help": "Cache misses by key namespace and tier.", "samples": misses},
+        {"name": "cache_hit_ratio", "type": "gauge", "help": "Hit ratio since this worker started.", "samples": ratios},
+        {"name": "redis_pool_connections_in_use", "type": "gauge", "help": "Redis connections currently checked out.", "samples": [({}, redis_pool["in_use"])] if redis_pool else []},
+    ]
+
+
+def _collect_password_hashing() -> List[dict]:
+    stats = hash_stats()
+    return [
+        {"name": "password_hash_queue_depth", "type": "gauge", "help": "Hash/verify jobs waiting for a slot.", "samples": [({}, stats["queued"])]},
+        {"name": "password_hash_running", "type": "gauge", "help": "Hash/verify jobs running.", "samples": [({}, stats["running"])]},
+        {"name": "password_hash_completed_total", "type": "counter", "help": "Hash/verify jobs finished.", "samples": [({}, stats["completed"])]},
+        {"name": "password_hash_queue_seconds_total", "type": "counter", "help": "Time jobs spent waiting for a slot.", "samples": [({}, stats["queue_time_total"])]},
+    ]
+
+
+register_collector(_collect_db_pools)
+register_collector(_collect_cache)
+register_collector(_collect_password_hashing)
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition for every worker."""
+    # counters and collectors are only safe to read on the event loop
+    body = await asyncio.to_thread(render_metrics, snapshot())
+    return Response(content=body, media_type=CONTENT_TYPE)
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, status
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query, status
 from pydantic import EmailStr
 
+from src.util.export import export_response
 from src.util.log import setup_logger
+from src.util.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from src.util.query_budget import query_budget
 from src.util.response import success_response
+from src.v1.auth.authorization import FreshRoleCheck, RoleCheck
 from src.v1.auth.service import AccessTokenBearer
+from src.v1.model.user import Role_Enum
 from src.v1.schema.user import UserCourse, UserResponse
 from src.v1.service.user import UserService
 
-from .util import get_user_service
+from .util import get_streaming_user_service, get_user_service
 
 logger = setup_logger(__name__, "user_route.log")
 
@@ -16,34 +23,89 @@ logger = setup_logger(__name__, "user_route.log")
 
 user_router = APIRouter()
 
+USER_EXPORT_FIELDS = (
+    "id",
+    "school_id",
+    "email",
+    "first_name",
+    "last_name",
+    "role",
+    "department",
+    "level",
+    "created_at",
+)
+
 # /path_param route MUST come BEFORE /query/{param}
 
 
 @user_router.get("/lecturers")
-async def fetch_all_lecturers(user_service: UserService = Depends(get_user_service)):
-    users = await user_service.fetch_all_lecturers()
+@query_budget(3)
+async def fetch_all_lecturers(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user_service: UserService = Depends(get_user_service),
+):
+    page = await user_service.fetch_all_lecturers(cursor, limit)
     user_list = []
-    for user in users:
+    for user in page.items:
         # logger.info(f"loop: {level}")
         user_value = UserResponse.model_validate(user).model_dump(exclude="password")
         # logger.info(level_value)
         user_list.append(user_value)
-    return success_response(status_code=status.HTTP_200_OK, data=user_list)
+    return success_response(status_code=status.HTTP_200_OK, data=user_list, page=page)
 
 
 @user_router.get("/students")
-async def fetch_all_students(user_service: UserService = Depends(get_user_service)):
-    users = await user_service.fetch_all_students()
+@query_budget(3)
+async def fetch_all_students(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user_service: UserService = Depends(get_user_service),
+):
+    page = await user_service.fetch_all_students(cursor, limit)
     user_list = []
-    for user in users:
+    for user in page.items:
         # logger.info(f"loop: {level}")
         user_value = UserResponse.model_validate(user).model_dump(exclude="password")
         # logger.info(level_value)
         user_list.append(user_value)
-    return success_response(status_code=status.HTTP_200_OK, data=user_list)
+    return success_response(status_code=status.HTTP_200_OK, data=user_list, page=page)
+
+
+@user_router.get("/lecturers/export")
+async def export_lecturers(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    gzip: bool = Query(False),
+    user_service: UserService = Depends(get_streaming_user_service),
+    role=Depends(FreshRoleCheck([Role_Enum.ADMIN])),
+):
+    return export_response(
+        user_service.stream_users(Role_Enum.LECTURER),
+        fmt=format,
+        filename="lecturers",
+        fieldnames=USER_EXPORT_FIELDS,
+        gzip=gzip,
+    )
+
+
+@user_router.get("/students/export")
+async def export_students(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    gzip: bool = Query(False),
+    user_service: UserService = Depends(get_streaming_user_service),
+    role=Depends(FreshRoleCheck([Role_Enum.ADMIN])),
+):
+    return export_response(
+        user_service.stream_users(Role_Enum.STUDENT),
+        fmt=format,
+        filename="students",
+        fieldnames=USER_EXPORT_FIELDS,
+        gzip=gzip,
+    )
 
 
 @user_router.get("/lecturers/{email}")
+@query_budget(2)
 async def fetch_lecturer_by_email(
     email: EmailStr, user_service: UserService = Depends(get_user_service)
 ):
@@ -53,6 +115,7 @@ async def fetch_lecturer_by_email(
 
 
 @user_router.get("/lecturers/{school_id}")
+@query_budget(2)
 async def fetch_lecturer_by_school_id(
     school_id: str, user_service: UserService = Depends(get_user_service)
 ):
@@ -62,6 +125,7 @@ async def fetch_lecturer_by_school_id(
 
 
 @user_router.get("/students/{email}")
+@query_budget(2)
 async def fetch_student_by_email(
     email: EmailStr, user_service: UserService = Depends(get_user_service)
 ):
@@ -71,6 +135,7 @@ async def fetch_student_by_email(
 
 
 @user_router.get("/students/{school_id}")
+@query_budget(2)
 async def fetch_student_by_school_id(
     school_id: str, user_service: UserService = Depends(get_user_service)
 ):
@@ -80,10 +145,12 @@ async def fetch_student_by_school_id(
 
 
 @user_router.post("/lecturers/courses")
+@query_budget(10)
 async def link_lecturers_to_courses(
     user_data: UserCourse,
     user_service: UserService = Depends(get_user_service),
     token_details: dict = Depends(AccessTokenBearer()),
+    role=Depends(RoleCheck([Role_Enum.LECTURER])),
 ):
     user_id = token_details["user"]["user_id"]
     validated_data = UserCourse.model_validate(
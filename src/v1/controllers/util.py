@@ -1,22 +1,85 @@
 #shared servicde Dependency
 
-from fastapi import Depends
+from typing import AsyncGenerator
+
+import jwt
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.util.db import get_session
+from src.util.db import (
+    has_recent_write,
+    mark_recent_write,
+    read_session_scope,
+    replica_configured,
+    session_scope,
+)
 from src.v1.auth.service import AccessTokenBearer
 from src.v1.service.courses import CourseService, DeptService, LevelService
+from src.v1.service.principal import load_principal
 from src.v1.service.user import UserService
 
-async def get_course_service(db: AsyncSession = Depends(get_session)):
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _request_owner(request: Request) -> str:
+    """
+    Who a request belongs to for read-your-writes purposes: the user in the
+    bearer token if there is one, otherwise the client address. The token is
+    only used to pick a database here, it is verified by AccessTokenBearer.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            claims = jwt.decode(token, options={"verify_signature": False})
+            return str(claims["user"]["user_id"])
+        except (jwt.PyJWTError, KeyError, TypeError):
+            pass
+    return request.client.host if request.client else "anonymous"
+
+
+async def get_routed_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    GET requests read from the replica, unless the same user wrote something in
+    the last few seconds, everything else goes to the primary.
+    """
+    read_only = request.method in READ_ONLY_METHODS
+    if not replica_configured():
+        scope = read_session_scope() if read_only else session_scope()
+        async with scope as session:
+            yield session
+        return
+
+    owner = _request_owner(request)
+    if read_only and not await has_recent_write(owner):
+        async with read_session_scope() as session:
+            yield session
+        return
+
+    if not read_only:
+        # marked before the route runs, so the marker is in place however
+        # early the response goes out; one left by a failed write only keeps
+        # the owner's reads on the primary, which is never stale
+        await mark_recent_write(owner)
+    async with session_scope() as session:
+        yield session
+
+
+# The session is function-scoped: FastAPI closes it, committing the unit of
+# work and running its after_commit callbacks, when the route returns and
+# before the response is sent, so a failed commit still reaches the client.
+async def get_course_service(db: AsyncSession = Depends(get_routed_session, scope="function")):
     return CourseService(db=db)
 
-async def get_level_service(db: AsyncSession = Depends(get_session)):
+async def get_level_service(db: AsyncSession = Depends(get_routed_session, scope="function")):
     return LevelService(db=db)
 
-async def get_dept_service(db: AsyncSession = Depends(get_session)):
+async def get_dept_service(db: AsyncSession = Depends(get_routed_session, scope="function")):
     return DeptService(db=db)
 
-async def get_user_service(db: AsyncSession = Depends(get_session)):
+async def get_user_service(db: AsyncSession = Depends(get_routed_session, scope="function")):
+    return UserService(db=db)
+
+async def get_streaming_user_service(db: AsyncSession = Depends(get_routed_session)):
+    """UserService whose session stays open while a streamed response body is sent."""
     return UserService(db=db)
 
 def get_access_token():
@@ -26,6 +89,7 @@ def get_access_token():
 async def get_current_user(user_details:dict = Depends(AccessTokenBearer()), 
 user_service: UserService = Depends(get_user_service)
 ):
+    """The authenticated user as a UserPrincipal, served from cache when possible."""
     user_id = user_details["user"]["user_id"] 
-    user = await user_service.check_if_user_exist_by_id(user_id)
-    return user
\ No newline at end of file
+    user = await load_principal(user_service, user_id)
+    return user
@@ -3,7 +3,7 @@ from src.v1.base.model import BaseModel
 # from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, String,  Enum as SqlEnum, Integer
+from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, String,  Enum as SqlEnum, Integer, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship, backref
 
 # from .user import user_course_association
@@ -15,6 +15,11 @@ class Department(BaseModel):
 
 
 class Course(BaseModel):
+    # keyset pagination order (created_at, id) within a department
+    __table_args__ = (
+        Index("ix_courses_department_id_created_at_id", "department_id", "created_at", "id"),
+    )
+
     name:Mapped[str] = mapped_column(String, nullable=False)
     code:Mapped[str] = mapped_column(String, nullable=False, unique=True)
     department_id:Mapped[uuid.UUID] = mapped_column(ForeignKey("departments.id"), nullable=False)
@@ -22,3 +27,14 @@ class Course(BaseModel):
     level_id:Mapped[uuid.UUID] = mapped_column(ForeignKey("levels.id"), nullable=False)
     level:Mapped["Level"] = relationship("Level", backref=backref("courses")) # type: ignore  # noqa: F821
     # users: Mapped[List["User"]] = relationship("User", secondary=user_course_association, back_populates="courses")
+
+
+# case-insensitive uniqueness enforced by postgres so creation needs no pre-check queries
+Index("uq_courses_lower_code", func.lower(Course.code), unique=True)
+Index(
+    "uq_courses_lower_name_department_id_level_id",
+    func.lower(Course.name),
+    Course.department_id,
+    Course.level_id,
+    unique=True,
+)
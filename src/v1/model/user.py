@@ -4,7 +4,7 @@ from src.v1.base.model import BaseModel
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, String,  Enum as SqlEnum, Integer, Table, Column
+from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, String,  Enum as SqlEnum, Integer, Table, Column, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship, backref
 from sqlalchemy.dialects.postgresql import UUID
 from enum import StrEnum, IntEnum
@@ -16,12 +16,16 @@ user_course_association = Table('user_course', BaseModel.metadata,
     Column('user_id', UUID(as_uuid=True), ForeignKey('users.id'), primary_key=True),
     Column('course_id', UUID(as_uuid=True), ForeignKey('courses.id'), primary_key=True),
     Column('registered_at', DateTime(timezone=True), default=datetime.utcnow),
+    # the primary key only serves user -> courses, rosters go course -> users
+    Index('ix_user_course_course_id_user_id', 'course_id', 'user_id'),
 )
 
 
 class Role_Enum(StrEnum):
     STUDENT = "student"
     LECTURER = "lecturer"
+    # not open to self-registration, granted directly in the database
+    ADMIN = "admin"
     
 class Level_Enum(IntEnum):
     LEVEL_100 = 100
@@ -32,6 +36,12 @@ class Level_Enum(IntEnum):
 
 
 class User(BaseModel):
+    # keyset pagination order (created_at, id) for the role and level filtered rosters
+    __table_args__ = (
+        Index("ix_users_role_created_at_id", "role", "created_at", "id"),
+        Index("ix_users_level_id_role_created_at_id", "level_id", "role", "created_at", "id"),
+    )
+
     email: Mapped[Optional[str]] = mapped_column(String, unique=True, nullable=True, index=True)
     first_name: Mapped[str] = mapped_column(String, nullable=False)
     last_name: Mapped[str] = mapped_column(String, nullable=False) 
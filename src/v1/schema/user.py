@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, ConfigDict, Field, model_validator, ValidationError, EmailStr
 import uuid
 from datetime import datetime
@@ -27,7 +27,7 @@ class CreateUser(UserBaseSchema):
 class CreateStudent(UserBaseSchema):
     password: str
     # Override the role field to default/force it to STUDENT for this endpoint
-    role: Role_Enum = Field(default=Role_Enum.STUDENT, Literal=True) # Forces it to be STUDENT
+    role: Literal[Role_Enum.STUDENT] = Role_Enum.STUDENT
     level: Level_Enum
     model_config = ConfigDict(from_attributes=True)
     
@@ -37,6 +37,18 @@ class CreateStudent(UserBaseSchema):
             raise ValueError("Level must be provided for students.")
         return self
 
+class BulkUserRow(UserBaseSchema):
+    password: str
+    # admins are never created through an import
+    role: Literal[Role_Enum.STUDENT, Role_Enum.LECTURER]
+    level: Optional[Level_Enum] = None
+
+    @model_validator(mode='after')
+    def validate_student_level(self) -> 'BulkUserRow':
+        if self.role == Role_Enum.STUDENT and self.level is None:
+            raise ValueError("Level must be provided for students.")
+        return self
+
 class Level(BaseModel):
     id: uuid.UUID
     name: Level_Enum
@@ -56,6 +68,17 @@ class UserResponse(UserBaseSchema):
 UserResponseList = List[UserResponse]
 
 
+class UserPrincipal(UserResponse):
+    """The authenticated user as cached for protected routes, courses reduced to ids."""
+    course_ids: List[uuid.UUID] = []
+
+    @classmethod
+    def from_user(cls, user) -> "UserPrincipal":
+        principal = cls.model_validate(user)
+        principal.course_ids = [course.id for course in user.courses]
+        return principal
+
+
 class UserCourse(BaseModel):
     user_id: Optional[uuid.UUID] = Field(default=None)
     course_id: uuid.UUID
\ No newline at end of file
@@ -0,0 +1,39 @@
+import uuid
+from typing import Optional
+
+from src.util.db import mark_recent_write
+from src.util.redis_client import bump_generation, delete_pattern, get_generation
+
+# cached, fully serialised bodies of the public catalogue endpoints
+CATALOGUE_PREFIX = "catalogue:"
+CATALOGUE_LEVELS_KEY = f"{CATALOGUE_PREFIX}levels"
+CATALOGUE_DEPARTMENTS_KEY = f"{CATALOGUE_PREFIX}departments"
+
+
+def _dept_courses_generation_key(dept_id: uuid.UUID) -> str:
+    return f"{CATALOGUE_PREFIX}dept-courses-gen:{dept_id}"
+
+
+def dept_courses_writer(dept_id: uuid.UUID) -> str:
+    """Read-your-writes owner marked when a department's courses change."""
+    return f"dept-courses:{dept_id}"
+
+
+async def dept_courses_key(dept_id: uuid.UUID, cursor: Optional[str], limit: int) -> str:
+    # pages of older generations are never read again and expire on their own
+    generation = await get_generation(_dept_courses_generation_key(dept_id))
+    return f"{CATALOGUE_PREFIX}dept-courses:{dept_id}:{generation}:{cursor or ''}:{limit}"
+
+
+async def invalidate_dept_courses(dept_id: uuid.UUID):
+    """
+    Retire every cached page of a department's course list. Pages are filled
+    from the primary for a while afterwards, see dept_courses_writer.
+    """
+    await mark_recent_write(dept_courses_writer(dept_id))
+    await bump_generation(_dept_courses_generation_key(dept_id))
+
+
+async def invalidate_catalogue():
+    """Drop every cached catalogue body, used when levels or departments change."""
+    await delete_pattern(f"{CATALOGUE_PREFIX}*")
@@ -1,18 +1,32 @@
 import uuid
+from functools import partial
+from typing import List, Optional, Tuple
 
-from sqlalchemy import select
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from src.util.db import after_commit
 from src.util.log import setup_logger
+from src.util.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 from src.v1.base.exception import AlreadyExistsError, NotFoundError, ServerError
-from src.v1.model import Course, Department, Level, Role_Enum, User
+from src.v1.model import Course, Level_Enum, Role_Enum, User
+from src.v1.base.schema import BulkRowResult
 from src.v1.schema.courses import CreateCourse
 from src.v1.schema.user import UserCourse
+from src.v1.service.catalogue import invalidate_dept_courses
+from src.v1.service.registry import reference_registry
 
 logger = setup_logger(__name__, "courses_service.log")
 
+# rows per multi-row INSERT
+BULK_INSERT_BATCH_SIZE = 1000
+
+# postgres SQLSTATE for foreign_key_violation
+FOREIGN_KEY_VIOLATION = "23503"
+
 # link courses to dept and level, have an endpoint where student/lecturers register courses based on level.
 # seed courses for 100l, lecturers register courses to teach, student register courses only based on their level and department
 
@@ -23,11 +37,8 @@ class LevelService:
 
     async def fetch_all_level(self):
         try:
-            stmt = await self.db.execute(select(Level))
-            all_levels = (
-                stmt.scalars().all()
-            )  # a list of Level objects: [Level(), Level(), ...]
-            # Use .all() (without .scalars()) to get a list of tuple rows, where each tuple contains the columns selected. Since you are selecting the entire Level entity, each tuple will contain a single Level object.
+            # levels come from the in-process registry, no query per request
+            all_levels = await reference_registry.levels()
             logger.info("Successfully fetched all levels.")
             return all_levels
         except SQLAlchemyError as e:
@@ -39,8 +50,7 @@ class LevelService:
 
     async def check_if_level_exist_by_id(self, level_id: uuid.UUID):
         try:
-            stmt = await self.db.execute(select(Level).where(Level.id == level_id))
-            level = stmt.scalar_one_or_none()
+            level = await reference_registry.level_by_id(level_id)
             if level:
                 logger.info(f"Level {level.name} found with ID {level_id}.")
             else:
@@ -57,6 +67,18 @@ class LevelService:
             )
             raise ServerError()
 
+    async def check_if_level_exist_by_name(self, level_name: Level_Enum):
+        try:
+            level = await reference_registry.level_by_name(level_name)
+            if not level:
+                logger.info(f"Level {level_name} not found.")
+            return level
+        except SQLAlchemyError as e:
+            logger.error(
+                f"Database error while checking level existence by name {level_name}: {e}"
+            )
+            raise ServerError()
+
     async def fetch_all_courses_for_a_level(self):
         try:
             stmt = await self.db.execute(
@@ -135,33 +157,37 @@ class DeptService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def fetch_all_courses_for_a_dept(self, dept_id: uuid.UUID):
-        stmt = await self.db.execute(
+    async def fetch_all_courses_for_a_dept(
+        self,
+        dept_id: uuid.UUID,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Page:
+        return await paginate(
+            self.db,
             select(Course)
             .options(selectinload(Course.department), selectinload(Course.level))
-            .where(Course.department_id == dept_id)
+            .where(Course.department_id == dept_id),
+            Course,
+            cursor,
+            limit,
         )
-        course = stmt.scalars().all()
-        return course
 
     async def fetch_all_dept(self):
-        stmt = await self.db.execute(select(Department))
-        department = stmt.scalars().all()
+        department = await reference_registry.departments()
         return department
 
     async def create_dept(self):
+        # once implemented: publish the change after commit so every worker's
+        # reference_registry reloads
         pass
 
     async def check_if_dept_exist_by_name(self, dept_name: str):
-        stmt = await self.db.execute(
-            select(Department).where(Department.name.ilike(dept_name))
-        )
-        department = stmt.scalar_one_or_none()
+        department = await reference_registry.department_by_name(dept_name)
         return department
 
     async def check_if_dept_exist_by_id(self, dept_id: uuid.UUID):
-        stmt = await self.db.execute(select(Department).where(Department.id == dept_id))
-        department = stmt.scalar_one_or_none()
+        department = await reference_registry.department_by_id(dept_id)
         return department
 
     async def check_if_course_exist_for_a_dept_by_course_code(
@@ -226,13 +252,21 @@ class CourseService:
         self.dept = DeptService(self.db)
 
     async def create_course(self, course_data: CreateCourse):
+        """
+        Create a course in a single round trip. Department and level are
+        resolved from the reference registry, uniqueness of the code and of
+        the name per department/level is enforced by unique indexes, so the
+        insert runs ON CONFLICT DO NOTHING and an empty RETURNING means the
+        course already exists. A department or level removed since the
+        registry loaded surfaces as a foreign key violation.
+        """
         try:
             logger.info(
                 f"Attempting to create course with name '{course_data.name}' and code '{course_data.code}' for department {course_data.department_id} and level {course_data.level_id}."
             )
             # ideally, only admin can create course (later update)
 
-            # check if dept and level exist
+            # check if dept and level exist (in-process registry, no round trip)
             dept = await self.dept.check_if_dept_exist_by_id(course_data.department_id)
             if not dept:
                 raise NotFoundError(f"{course_data.department_id} does not exist")
@@ -241,53 +275,52 @@ class CourseService:
             if not level:
                 raise NotFoundError(f"{course_data.level_id} does not exist")
 
-            # check if the course exist in  dept and level
-            course_exist_by_code_dept = (
-                await self.dept.check_if_course_exist_for_a_dept_by_course_code(
-                    course_data.department_id, course_data.code
-                )
-            )
-            course_exist_by_code_level = (
-                await self.level.check_if_course_exist_for_a_level_by_course_code(
-                    course_data.level_id, course_data.code
-                )
-            )
-            course_exist_by_name_dept = (
-                await self.dept.check_if_course_exist_for_a_dept_by_course_name(
-                    course_data.department_id, course_data.name
-                )
-            )
-            course_exist_by_name_level = (
-                await self.level.check_if_course_exist_for_a_level_by_course_name(
-                    course_data.level_id, course_data.name
+            courses = Course.__table__
+            stmt = await self.db.execute(
+                pg_insert(courses)
+                .values(
+                    id=uuid.uuid4(),
+                    name=course_data.name,
+                    code=course_data.code,
+                    department_id=course_data.department_id,
+                    level_id=course_data.level_id,
                 )
+                .on_conflict_do_nothing()
+                .returning(courses.c.id, courses.c.name, courses.c.code)
             )
-
-            course_exist = (
-                course_exist_by_code_dept and course_exist_by_code_level
-            ) or (course_exist_by_name_dept and course_exist_by_name_level)
-
-            if course_exist:
+            row = stmt.one_or_none()
+            if row is None:
                 logger.warning(
                     f"Course creation failed: Course with name '{course_data.name}' or code '{course_data.code}' already exists for department {course_data.department_id} and level {course_data.level_id}."
                 )
                 raise AlreadyExistsError(
-                    f"{course_exist.name} already exist for {course_exist.department.name}"
+                    f"{course_data.name} ({course_data.code}) already exists"
                 )
 
-            new_course = Course(
-                name=course_data.name,
-                code=course_data.code,
-                department=dept,
-                level=level,
-            )
-            self.db.add(new_course)
-            await self.db.commit()
-            await self.db.refresh(new_course)
+            new_course = {
+                "id": row.id,
+                "name": row.name,
+                "code": row.code,
+                "department": dept,
+                "level": level,
+            }
+            after_commit(self.db, partial(invalidate_dept_courses, dept.id))
             logger.info(
-                f"Successfully created course '{new_course.name}' with code '{new_course.code}' for department {new_course.department.name} and level {new_course.level.name}."
+                f"Successfully created course '{row.name}' with code '{row.code}' for department {dept.name} and level {level.name}."
             )
             return new_course
+        except IntegrityError as e:
+            if getattr(e.orig, "sqlstate", None) == FOREIGN_KEY_VIOLATION:
+                logger.warning(
+                    f"Course creation failed: department {course_data.department_id} or level {course_data.level_id} does not exist."
+                )
+                raise NotFoundError(
+                    f"{course_data.department_id} or {course_data.level_id} does not exist"
+                )
+            logger.error(
+                f"Integrity error while creating course with name '{course_data.name}' and code '{course_data.code}': {e}"
+            )
+            raise ServerError()
         except SQLAlchemyError as e:
             logger.error(
                 f"Database error while creating course with name '{course_data.name}' and code '{course_data.code}': {e}"
@@ -297,6 +330,113 @@ class CourseService:
         #     logger.error(f"An unexpected error occurred while creating course with name '{course_data.name}' and code '{course_data.code}': {e}")
         #     raise ServerError()
 
+    async def bulk_create_courses(
+        self, rows: List[Tuple[int, CreateCourse]]
+    ) -> List[BulkRowResult]:
+        """
+        Create a catalogue of courses in one transaction. Department and level
+        ids are checked against the reference registry, existing codes and
+        existing names per department/level with one set-based query each,
+        before the batch is inserted.
+
+        Args:
+            rows: (row index, validated row) pairs.
+
+        Returns:
+            List[BulkRowResult]: One result per input row.
+        """
+        results: List[BulkRowResult] = []
+        try:
+            logger.info(f"Bulk importing {len(rows)} courses.")
+            known_depts = {
+                dept_id
+                for dept_id in {row.department_id for _, row in rows}
+                if await reference_registry.department_by_id(dept_id)
+            }
+            known_levels = {
+                level_id
+                for level_id in {row.level_id for _, row in rows}
+                if await reference_registry.level_by_id(level_id)
+            }
+
+            codes = {row.code.lower() for _, row in rows}
+            stmt = await self.db.execute(
+                select(func.lower(Course.code)).where(func.lower(Course.code).in_(codes))
+            )
+            taken_codes = set(stmt.scalars().all())
+
+            name_keys = {
+                (row.name.lower(), row.department_id, row.level_id) for _, row in rows
+            }
+            stmt = await self.db.execute(
+                select(func.lower(Course.name), Course.department_id, Course.level_id).where(
+                    tuple_(
+                        func.lower(Course.name), Course.department_id, Course.level_id
+                    ).in_(name_keys)
+                )
+            )
+            taken_names = set(tuple(row) for row in stmt.all())
+
+            accepted = []
+            for index, row in rows:
+                code = row.code.lower()
+                name_key = (row.name.lower(), row.department_id, row.level_id)
+                error = None
+                if row.department_id not in known_depts:
+                    error = f"{row.department_id} does not exist"
+                elif row.level_id not in known_levels:
+                    error = f"{row.level_id} does not exist"
+                elif code in taken_codes:
+                    error = f"course code {row.code} already exists"
+                elif name_key in taken_names:
+                    error = f"{row.name} already exists for this department and level"
+                if error:
+                    results.append(BulkRowResult(row=index, status="error", error=error))
+                    continue
+                # later rows in the same upload count as duplicates too
+                taken_codes.add(code)
+                taken_names.add(name_key)
+                accepted.append(
+                    (
+                        index,
+                        {
+                            "id": uuid.uuid4(),
+                            "name": row.name,
+                            "code": row.code,
+                            "department_id": row.department_id,
+                            "level_id": row.level_id,
+                        },
+                    )
+                )
+
+            inserted = set()
+            values = [value for _, value in accepted]
+            for start in range(0, len(values), BULK_INSERT_BATCH_SIZE):
+                stmt = await self.db.execute(
+                    pg_insert(Course.__table__)
+                    .values(values[start : start + BULK_INSERT_BATCH_SIZE])
+                    .on_conflict_do_nothing()
+                    .returning(Course.__table__.c.id)
+                )
+                inserted.update(stmt.scalars().all())
+
+            for dept_id in {value["department_id"] for value in values}:
+                after_commit(self.db, partial(invalidate_dept_courses, dept_id))
+
+            for index, value in accepted:
+                if value["id"] in inserted:
+                    results.append(BulkRowResult(row=index, status="created", id=value["id"]))
+                else:
+                    # lost a race with a concurrent creator
+                    results.append(
+                        BulkRowResult(row=index, status="error", error="course already exists")
+                    )
+            logger.info(f"Bulk import inserted {len(inserted)} of {len(rows)} courses.")
+            return results
+        except SQLAlchemyError as e:
+            logger.error(f"Database error during bulk course import: {e}", exc_info=True)
+            raise ServerError()
+
     async def check_course_dept(self, course_id: uuid.UUID):
         try:
             stmt = await self.db.execute(
@@ -321,7 +461,12 @@ class CourseService:
         #     logger.error(f"An unexpected error occurred while checking course existence by ID {course_id}: {e}")
         #     raise ServerError()
 
-    async def fetch_all_student_taking_course(self, data: UserCourse):
+    async def fetch_all_student_taking_course(
+        self,
+        data: UserCourse,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Page:
         try:
             logger.info(f"Fetching course with ID {data.course_id}.")
             # fetch the course, with the lecturer, query to get all student and course sharing the same level
@@ -342,16 +487,19 @@ class CourseService:
                 f"Course '{course.name}' found with ID {data.course_id} at level {course.level.name}."
             )
             logger.info(f"Fetching all students for level {course.level.name}.")
-            stmt = await self.db.execute(
+            page = await paginate(
+                self.db,
                 select(User)
                 .options(selectinload(User.level), selectinload(User.department))
-                .where(User.role == Role_Enum.STUDENT, course.level_id == User.level_id)
+                .where(User.role == Role_Enum.STUDENT, course.level_id == User.level_id),
+                User,
+                cursor,
+                limit,
             )
-            students = stmt.scalars().all()
             logger.info(
-                f"Successfully fetched {len(students)} students for course {course.name}."
+                f"Successfully fetched {len(page.items)} students for course {course.name}."
             )
-            return students
+            return page
         except SQLAlchemyError as e:
             logger.error(
                 f"Database error while fetching students for course {data.course_id}: {e}",
@@ -362,7 +510,12 @@ class CourseService:
         #     logger.error(f"An unexpected error occurred while fetching students for course {data.course_id}: {e}")
         #     raise ServerError()
 
-    async def fetch_all_lecturers_taking_course(self, data: UserCourse):
+    async def fetch_all_lecturers_taking_course(
+        self,
+        data: UserCourse,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Page:
         try:
             logger.info(f"Fetching course with ID {data.course_id}.")
             stmt = await self.db.execute(
@@ -381,20 +534,23 @@ class CourseService:
                 f"Course '{course.name}' found with ID {data.course_id} for department {course.department.name}."
             )
             logger.info(f"Fetching all lecturer for level {course.level.name}.")
-            stmt = await self.db.execute(
+            page = await paginate(
+                self.db,
                 select(User).join(
                     User.courses
                 )
                 .options(
                 selectinload(User.level),
                 selectinload(User.department))
-                .where(User.role == Role_Enum.LECTURER)
+                .where(User.role == Role_Enum.LECTURER, Course.id == course.id),
+                User,
+                cursor,
+                limit,
             )
-            students = stmt.scalars().all()
             logger.info(
-                f"Successfully fetched {len(students)} students for course {course.name}."
+                f"Successfully fetched {len(page.items)} lecturers for course {course.name}."
             )
-            return students
+            return page
         except SQLAlchemyError as e:
             logger.error(
                 f"Database error while fetching students for course {data.course_id}: {e}",
@@ -0,0 +1,48 @@
+import uuid
+from typing import Optional
+
+from src.util.config import config
+from src.util.log import setup_logger
+from src.util.redis_client import delete_cache, get_cache, set_cache
+from src.v1.schema.user import UserPrincipal
+
+logger = setup_logger(__name__, "user_service.log")
+
+# the user behind an access token, cached so protected routes skip the
+# user + courses + department + level queries
+PRINCIPAL_PREFIX = "principal:"
+
+
+def principal_key(user_id: uuid.UUID | str) -> str:
+    return f"{PRINCIPAL_PREFIX}{user_id}"
+
+
+async def load_principal(user_service, user_id: uuid.UUID | str) -> Optional[UserPrincipal]:
+    """
+    Resolve `user_id` to a UserPrincipal from the cache, loading it with
+    `user_service` on a miss. Unknown users are not cached.
+
+    Args:
+        user_service: UserService bound to the request's session
+        user_id: id from the access token
+
+    Returns:
+        Optional[UserPrincipal]: None if the user does not exist
+    """
+    key = principal_key(user_id)
+    cached = await get_cache(key)
+    if cached is not None:
+        return UserPrincipal.model_validate(cached)
+
+    user = await user_service.check_if_user_exist_by_id(user_id)
+    if user is None:
+        return None
+    principal = UserPrincipal.from_user(user)
+    await set_cache(key, principal.model_dump(mode="json"), ttl=config.principal_cache_ttl)
+    return principal
+
+
+async def invalidate_principal(user_id: uuid.UUID | str):
+    """Drop the cached principal of a user whose profile or courses changed."""
+    logger.debug("Invalidating cached principal for user %s", user_id)
+    await delete_cache(principal_key(user_id))
@@ -0,0 +1,131 @@
+import asyncio
+import uuid
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from src.util.db import async_session
+from src.util.log import setup_logger
+from src.util.redis_client import get_blocking_redis, get_redis
+from src.v1.service.catalogue import invalidate_catalogue
+from src.v1.model import Department, Level, Level_Enum
+
+logger = setup_logger(__name__, "registry.log")
+
+# seconds to wait before resubscribing after the pub/sub connection drops
+RESUBSCRIBE_DELAY = 5
+
+
+class ReferenceRegistry:
+    """
+    In-process copy of the Level and Department tables, indexed by id and by
+    case-folded name. The tables hold a handful of rows that almost never
+    change, so every worker loads them once at startup and reloads when any
+    worker publishes a change on CHANNEL.
+
+    The objects handed out are detached and shared between requests: never
+    modify them, and `await session.merge(obj, load=False)` before attaching
+    one to a new row.
+    """
+
+    CHANNEL = "reference-data:changed"
+
+    def __init__(self):
+        self._levels_by_id: Dict[uuid.UUID, Level] = {}
+        self._levels_by_name: Dict[Level_Enum, Level] = {}
+        self._depts_by_id: Dict[uuid.UUID, Department] = {}
+        self._depts_by_name: Dict[str, Department] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """(Re)load both tables from the primary and swap the indexes in one go."""
+        async with async_session() as session:
+            levels = (await session.execute(select(Level))).scalars().all()
+            depts = (await session.execute(select(Department))).scalars().all()
+
+        self._levels_by_id = {level.id: level for level in levels}
+        self._levels_by_name = {level.name: level for level in levels}
+        self._depts_by_id = {dept.id: dept for dept in depts}
+        self._depts_by_name = {dept.name.casefold(): dept for dept in depts}
+        self._loaded = True
+        logger.info(f"Loaded {len(levels)} levels and {len(depts)} departments.")
+
+    async def ensure_loaded(self):
+        # scripts and anything running outside life_span load on first use
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                await self.load()
+
+    async def levels(self) -> List[Level]:
+        await self.ensure_loaded()
+        return sorted(self._levels_by_id.values(), key=lambda level: level.name)
+
+    async def level_by_id(self, level_id: uuid.UUID) -> Optional[Level]:
+        await self.ensure_loaded()
+        return self._levels_by_id.get(level_id)
+
+    async def level_by_name(self, name: Level_Enum) -> Optional[Level]:
+        await self.ensure_loaded()
+        return self._levels_by_name.get(name)
+
+    async def departments(self) -> List[Department]:
+        await self.ensure_loaded()
+        return sorted(self._depts_by_id.values(), key=lambda dept: dept.name)
+
+    async def department_by_id(self, dept_id: uuid.UUID) -> Optional[Department]:
+        await self.ensure_loaded()
+        return self._depts_by_id.get(dept_id)
+
+    async def department_by_name(self, name: str) -> Optional[Department]:
+        await self.ensure_loaded()
+        return self._depts_by_name.get(name.casefold())
+
+    async def publish_change(self):
+        """Tell every worker (this one included) to reload. Call after the change is committed."""
+        # cached catalogue bodies embed level/department names
+        await invalidate_catalogue()
+        try:
+            redis = await get_redis()
+            await redis.publish(self.CHANNEL, "reload")
+        except Exception as e:
+            logger.error(f"Failed to publish reference data change: {e}")
+            # at least this worker will not serve stale data
+            await self.load()
+
+    async def _listen(self):
+        while True:
+            try:
+                redis = await get_blocking_redis()
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    # changes may have been missed while we were not subscribed
+                    await self.load()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            logger.info("Reference data changed, reloading.")
+                            await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reference data listener failed, retrying: {e}")
+                await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+    async def start(self):
+        await self.load()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+reference_registry = ReferenceRegistry()
@@ -1,26 +1,39 @@
 import uuid
+from functools import partial
+from typing import AsyncIterator, List, Optional, Tuple
 
-from sqlalchemy import select
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from src.util.db import after_commit, savepoint
+from src.util.export import EXPORT_BATCH_SIZE
 from src.util.log import setup_logger
+from src.util.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 from src.v1.auth.schema import Login
-from src.v1.auth.service import password_hash, verify_password
+from src.v1.auth.service import hash_password, hash_passwords, verify_and_update_password
 from src.v1.base.exception import (
     AlreadyExistsError,
     AuthorizationError,
+    BadRequest,
     InvalidEmailPassword,
     NotFoundError,
     ServerError,
 )
 from src.v1.model import Department, Level, Role_Enum, User
-from src.v1.schema.user import CreateStudent, CreateUser, UserCourse
+from src.v1.base.schema import BulkRowResult
+from src.v1.schema.user import BulkUserRow, CreateStudent, CreateUser, UserCourse
 from src.v1.service.courses import CourseService
+from src.v1.service.principal import invalidate_principal
+from src.v1.service.registry import reference_registry
 
 logger = setup_logger(__name__, "user_service.log")
 
+# rows per multi-row INSERT, keeps each statement well under asyncpg's bind limit
+BULK_INSERT_BATCH_SIZE = 1000
+
 
 class UserService:
     def __init__(self, db: AsyncSession):
@@ -41,28 +54,24 @@ class UserService:
                 logger.warning(f"User with ID {user.id} already exists.")
                 raise AlreadyExistsError(f"User with ID {user.id} already exist")
 
-            password = password_hash(user_data.password)
+            password = await hash_password(user_data.password)
             user_data.password = password
 
             # seed department, fetch the department, link users to dept both lecturer and student(link level too)
-            #
-            stmt = await self.db.execute(
-                select(Department).where(Department.name.ilike(user_data.department))
-            )
-            dept = stmt.scalar_one_or_none()
+            # departments and levels come from the in-process registry; merge
+            # with load=False attaches a session-local copy without a query
+            dept = await self.course.dept.check_if_dept_exist_by_name(user_data.department)
             if not dept:
                 raise NotFoundError(f"{user_data.department} not found")
+            dept = await self.db.merge(dept, load=False)
 
             # link student to level
             level = None
             if user_data.role == Role_Enum.STUDENT and user_data.level is not None:
-                # seed the level in the db, query the level table based on student level, link to users
-                stmt = await self.db.execute(
-                    select(Level).where(Level.name == user_data.level)
-                )
-                level = stmt.scalar_one_or_none()
+                level = await self.course.level.check_if_level_exist_by_name(user_data.level)
                 if not level:
                     raise NotFoundError(f"{user_data.level} not found")
+                level = await self.db.merge(level, load=False)
 
             new_user = User(
                 email=user_data.email,
@@ -76,15 +85,126 @@ class UserService:
             )
 
             self.db.add(new_user)
-            await self.db.refresh(new_user)
-            await self.db.commit()
+            # the request's unit of work commits, flushing assigns the id and timestamps
+            await self.db.flush()
             logger.info(f"User {new_user.id} created successfully.")
             return new_user
         except AlreadyExistsError as e:
             logger.error(f"Failed to create user: {e}")
+            raise
         except SQLAlchemyError as e:
             logger.error(f"Error creating user: {e}")
-            await self.db.rollback()
+            raise ServerError()
+
+    async def bulk_create_users(
+        self, rows: List[Tuple[int, BulkUserRow]]
+    ) -> List[BulkRowResult]:
+        """
+        Create many users with a handful of set-based queries: departments and
+        levels come from the reference registry, existing emails/school_ids
+        are found with one query for the whole batch, passwords are hashed in
+        a process pool and rows are inserted in multi-row
+        INSERT ... ON CONFLICT DO NOTHING batches.
+
+        Args:
+            rows: (row index, validated row) pairs.
+
+        Returns:
+            List[BulkRowResult]: One result per input row.
+        """
+        results: List[BulkRowResult] = []
+        try:
+            logger.info(f"Bulk importing {len(rows)} users.")
+            depts = {}
+            for name in {row.department.lower() for _, row in rows}:
+                dept = await reference_registry.department_by_name(name)
+                if dept:
+                    depts[name] = dept
+
+            levels = {}
+            for name in {row.level for _, row in rows if row.level is not None}:
+                level = await reference_registry.level_by_name(name)
+                if level:
+                    levels[name] = level
+
+            emails = {row.email.lower() for _, row in rows}
+            school_ids = {row.school_id.lower() for _, row in rows}
+            stmt = await self.db.execute(
+                select(func.lower(User.email), func.lower(User.school_id)).where(
+                    or_(
+                        func.lower(User.email).in_(emails),
+                        func.lower(User.school_id).in_(school_ids),
+                    )
+                )
+            )
+            taken_emails, taken_school_ids = set(), set()
+            for email, school_id in stmt.all():
+                taken_emails.add(email)
+                taken_school_ids.add(school_id)
+
+            accepted = []
+            for index, row in rows:
+                email, school_id = row.email.lower(), row.school_id.lower()
+                error = None
+                if email in taken_emails:
+                    error = f"email {row.email} already exists"
+                elif school_id in taken_school_ids:
+                    error = f"school_id {row.school_id} already exists"
+                elif row.department.lower() not in depts:
+                    error = f"{row.department} not found"
+                elif row.role == Role_Enum.STUDENT and row.level not in levels:
+                    # BulkUserRow already requires a level for students
+                    error = f"level {row.level} not found"
+                if error:
+                    results.append(BulkRowResult(row=index, status="error", error=error))
+                    continue
+                # later rows in the same upload count as duplicates too
+                taken_emails.add(email)
+                taken_school_ids.add(school_id)
+                accepted.append((index, row))
+
+            hashed = await hash_passwords([row.password for _, row in accepted])
+
+            values = []
+            for (index, row), hashed_password in zip(accepted, hashed):
+                level = levels.get(row.level) if row.role == Role_Enum.STUDENT else None
+                values.append(
+                    {
+                        "id": uuid.uuid4(),
+                        "email": row.email,
+                        "first_name": row.first_name,
+                        "last_name": row.last_name,
+                        "password": hashed_password,
+                        "school_id": row.school_id,
+                        "role": row.role,
+                        "level_id": level.id if level else None,
+                        "department_id": depts[row.department.lower()].id,
+                    }
+                )
+
+            inserted = set()
+            for start in range(0, len(values), BULK_INSERT_BATCH_SIZE):
+                batch = values[start : start + BULK_INSERT_BATCH_SIZE]
+                stmt = await self.db.execute(
+                    pg_insert(User.__table__)
+                    .values(batch)
+                    .on_conflict_do_nothing()
+                    .returning(User.__table__.c.id)
+                )
+                inserted.update(stmt.scalars().all())
+
+            for (index, row), value in zip(accepted, values):
+                if value["id"] in inserted:
+                    results.append(BulkRowResult(row=index, status="created", id=value["id"]))
+                else:
+                    # lost a race with a concurrent registration
+                    results.append(
+                        BulkRowResult(row=index, status="error", error="user already exists")
+                    )
+            logger.info(f"Bulk import inserted {len(inserted)} of {len(rows)} users.")
+            return results
+        except SQLAlchemyError as e:
+            logger.error(f"Database error during bulk user import: {e}", exc_info=True)
             raise ServerError()
 
     async def authenticate_user(self, user_data: Login):
@@ -117,11 +237,17 @@ class UserService:
                 )
 
             # verify password
-            if not verify_password(user_data.password, user.password):
+            valid, new_hash = await verify_and_update_password(user_data.password, user.password)
+            if not valid:
                 logger.warning(
                     f"Authentication failed: Invalid password for user {user.id}."
                 )
                 raise InvalidEmailPassword()
+            if new_hash is not None:
+                # stored with an old scheme or cost, upgrade while we have the plaintext
+                user.password = new_hash
+                await self.db.flush()
+                logger.info(f"Rehashed password for user {user.id}.")
 
             # do further authentication
 
@@ -136,16 +262,21 @@ class UserService:
         #     logger.error(f"An unexpected error occurred during authentication: {e}")
         #     raise ServerError()
 
-    async def fetch_all_lecturers(self):
+    async def fetch_all_lecturers(
+        self, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE
+    ) -> Page:
         try:
-            stmt = await self.db.execute(
+            page = await paginate(
+                self.db,
                 select(User)
                 .options(selectinload(User.department))
-                .where(User.role == Role_Enum.LECTURER)
+                .where(User.role == Role_Enum.LECTURER),
+                User,
+                cursor,
+                limit,
             )
-            lecturers = stmt.scalars().all()
-            logger.info(f"Successfully fetched {len(lecturers)} lecturers.")
-            return lecturers
+            logger.info(f"Successfully fetched {len(page.items)} lecturers.")
+            return page
         except SQLAlchemyError as e:
             logger.error(f"Database error while fetching all lecturers: {e}")
             raise ServerError()
@@ -153,28 +284,69 @@ class UserService:
         #     logger.error(f"An unexpected error occurred while fetching all lecturers: {e}")
         #     raise ServerError()
 
-    async def fetch_all_students(self):
+    async def fetch_all_students(
+        self, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE
+    ) -> Page:
         try:
-            stmt = await self.db.execute(
+            page = await paginate(
+                self.db,
                 select(User)
                 .options(selectinload(User.department), selectinload(User.level))
-                .where(User.role == Role_Enum.STUDENT)
+                .where(User.role == Role_Enum.STUDENT),
+                User,
+                cursor,
+                limit,
             )
-            students = stmt.scalars().all()
-            logger.info(f"Successfully fetched {len(students)} students.")
-            return students
+            logger.info(f"Successfully fetched {len(page.items)} students.")
+            return page
         except SQLAlchemyError as e:
             logger.error(f"Database error while fetching all students: {e}")
             raise ServerError()
+        except BadRequest:
+            raise
         except Exception as e:
             logger.error(
                 f"An unexpected error occurred while fetching all students: {e}"
             )
             raise ServerError()
 
+    async def stream_users(self, role: Role_Enum) -> AsyncIterator[dict]:
+        """
+        Yield every user with `role` as a flat dict, read through a server-side
+        cursor in batches so memory stays flat regardless of roster size.
+        """
+        stmt = (
+            select(
+                User.id,
+                User.school_id,
+                User.email,
+                User.first_name,
+                User.last_name,
+                User.role,
+                Department.name.label("department"),
+                Level.name.label("level"),
+                User.created_at,
+            )
+            .outerjoin(Department, User.department_id == Department.id)
+            .outerjoin(Level, User.level_id == Level.id)
+            .where(User.role == role)
+            .order_by(User.created_at, User.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        try:
+            result = await self.db.stream(stmt)
+            exported = 0
+            async for row in result.mappings():
+                exported += 1
+                yield dict(row)
+            logger.info(f"Exported {exported} users with role {role}.")
+        except SQLAlchemyError as e:
+            logger.error(f"Database error while exporting users with role {role}: {e}")
+            raise ServerError()
+
     async def check_if_user_exist_by_email(self, email: str):
         try:
-            logger.debug(f"Checking if user exists with email: {email}")
+            logger.debug("Checking if user exists with email: %s", email)
             stmt = await self.db.execute(
                 select(User)
                 .options(selectinload(User.department))
@@ -182,9 +354,9 @@ class UserService:
             )
             user = stmt.scalar_one_or_none()
             if user:
-                logger.debug(f"User with email {email} found.")
+                logger.debug("User with email %s found.", email)
             else:
-                logger.debug(f"User with email {email} not found.")
+                logger.debug("User with email %s not found.", email)
             return user
         except SQLAlchemyError as e:
             logger.error(f"Error checking if user exists by email {email}: {e}")
@@ -192,7 +364,7 @@ class UserService:
 
     async def check_if_user_exist_by_id(self, id: uuid.UUID):
         try:
-            logger.debug(f"Checking if user exists with id: {id}")
+            logger.debug("Checking if user exists with id: %s", id)
             stmt = await self.db.execute(
                 select(User)
                 .options(
@@ -205,9 +377,9 @@ class UserService:
             )
             user = stmt.scalar_one_or_none()
             if user:
-                logger.debug(f"User with id {id} found.")
+                logger.debug("User with id %s found.", id)
             else:
-                logger.debug(f"User with id {id} not found.")
+                logger.debug("User with id %s not found.", id)
             return user
         except SQLAlchemyError as e:
             logger.error(
@@ -215,17 +387,25 @@ class UserService:
             )
             raise ServerError()
 
+    async def fetch_user_role(self, id: uuid.UUID) -> Optional[Role_Enum]:
+        """Current role of a user, None if the user does not exist."""
+        try:
+            return await self.db.scalar(select(User.role).where(User.id == id))
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching role of user {id}: {e}", exc_info=True)
+            raise ServerError()
+
     async def check_if_user_exist_by_school_id(self, school_id: str):
         try:
-            logger.debug(f"Checking if user exists with school ID: {school_id}")
+            logger.debug("Checking if user exists with school ID: %s", school_id)
             stmt = await self.db.execute(
                 select(User).where(User.school_id.ilike(school_id))
             )
             user = stmt.scalar_one_or_none()
             if user:
-                logger.debug(f"User with school ID {school_id} found.")
+                logger.debug("User with school ID %s found.", school_id)
             else:
-                logger.debug(f"User with school ID {school_id} not found.")
+                logger.debug("User with school ID %s not found.", school_id)
             return user
         except SQLAlchemyError as e:
             logger.error(f"Error checking if user exists by school ID {school_id}: {e}")
@@ -260,10 +440,20 @@ class UserService:
                 )
                 raise AuthorizationError(f"{user.id} cannot register this course")
 
+            if course in user.courses:
+                logger.warning(f"Lecturer {user.id} is already linked to course {course.id}.")
+                raise AlreadyExistsError(f"{user.id} is already linked to {course.code}")
+
             # add more checks if needed
-            user.courses.append(course)
-            self.db.add(user)
-            await self.db.commit()
+            try:
+                async with savepoint(self.db):
+                    user.courses.append(course)
+                    await self.db.flush()
+            except IntegrityError:
+                # a concurrent request linked the same course first
+                raise AlreadyExistsError(f"{user.id} is already linked to {course.code}")
+            # the cached principal carries the lecturer's course ids
+            after_commit(self.db, partial(invalidate_principal, user.id))
             logger.info(
                 f"Successfully linked lecturer {user.first_name} to course {course.name}."
             )
@@ -273,7 +463,6 @@ class UserService:
                 f"Database error while linking lecturer {user_data.user_id} to course {user_data.course_id}: {e}",
                 exc_info=True,
             )
-            await self.db.rollback()
             raise ServerError()
         # except Exception as e:
         #     logger.error(f"An unexpected error occurred while linking lecturer {lect_id} to course {course_id.course_id}: {e}")
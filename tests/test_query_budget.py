@@ -0,0 +1,96 @@
+"""
+Statement budgets, see src/util/query_budget.py.
+
+    python -m unittest discover -s tests -t .
+
+Needs the app's settings (.env). The route tests also need the database
+seeded by src/seed.py and Redis, and only run with RUN_DB_TESTS=1.
+"""
+import os
+import time
+import unittest
+import uuid
+
+from httpx import ASGITransport, AsyncClient
+
+from src.util import db
+from src.util.config import Settings, config
+from src.util.query_budget import QueryBudgetExceeded, assert_max_queries
+
+
+def _execute(statement: str, parameters=()):
+    """Feed a statement to the query observers the way the engine events do."""
+    now = time.time_ns()
+    for observer in list(db._query_observers):
+        observer(statement, parameters, now, now)
+
+
+class AssertMaxQueriesTest(unittest.IsolatedAsyncioTestCase):
+    async def test_within_budget(self):
+        async with assert_max_queries(2) as queries:
+            _execute("SELECT 1")
+            _execute("SELECT 2")
+        self.assertEqual(queries.count, 2)
+
+    async def test_over_budget_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            async with assert_max_queries(1):
+                _execute("SELECT 1")
+                _execute("SELECT 2")
+
+    async def test_statements_after_the_block_are_not_counted(self):
+        async with assert_max_queries(1) as queries:
+            _execute("SELECT 1")
+        _execute("SELECT 2")
+        self.assertEqual(queries.count, 1)
+
+    async def test_reports_n_plus_one(self):
+        statement = "SELECT users.id FROM users WHERE users.id = $1"
+        with self.assertLogs("src.util.query_budget", "WARNING") as logs:
+            async with assert_max_queries(config.n_plus_one_threshold):
+                for user_id in range(config.n_plus_one_threshold):
+                    _execute(statement, (user_id,))
+        self.assertIn("Possible N+1", logs.output[0])
+
+    async def test_same_parameters_are_not_n_plus_one(self):
+        async with assert_max_queries(config.n_plus_one_threshold) as queries:
+            for _ in range(config.n_plus_one_threshold):
+                _execute("SELECT 1 WHERE $1", (True,))
+        self.assertEqual(queries.repeated(config.n_plus_one_threshold), [])
+
+
+@unittest.skipUnless(os.environ.get("RUN_DB_TESTS") == "1", "needs the seeded database and Redis")
+class LoginQueryBudgetTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from src.main import app, life_span
+
+        self._lifespan = life_span(app)
+        await self._lifespan.__aenter__()
+        self.client = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+        suffix = uuid.uuid4().hex[:12]
+        self.credentials = {"school_id": f"budget-{suffix}", "password": "budget-test-password"}
+        response = await self.client.post(
+            f"{Settings.API_PREFIX}/auth/lecturer-register",
+            json={
+                **self.credentials,
+                "email": f"budget-{suffix}@example.com",
+                "first_name": "Query",
+                "last_name": "Budget",
+                "department": "Computer Science",
+            },
+        )
+        self.assertEqual(response.status_code, 201, response.text)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await self._lifespan.__aexit__(None, None, None)
+
+    async def test_login_stays_within_its_budget(self):
+        # @query_budget(4) on the route, dependencies included
+        async with assert_max_queries(4):
+            response = await self.client.post(f"{Settings.API_PREFIX}/auth/login", json=self.credentials)
+        self.assertEqual(response.status_code, 200, response.text)
+
+
+if __name__ == "__main__":
+    unittest.main()